@@ -0,0 +1,268 @@
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from board import Board
+from positions import STANDARD_POSITIONS, get_positions
+from tournament import make_player
+
+DEFAULT_ENGINES = {
+    "minimax": {"type": "minimax", "max_depth": 4},
+    "alphabeta": {"type": "alphabeta", "max_depth": 6},
+}
+
+
+def benchmark_position(position, config, repeat=3):
+    """Measures the search of one engine on one position.
+
+    The position is first searched with increasing depths (1, 2, ... up to the max_depth of the
+    engine, as in iterative deepening) to time each depth. It is then searched to max_depth by
+    fresh players, repeat times to keep the fastest time, and once more with tracemalloc 
+    running to measure the peak memory allocated by the search.
+
+    Args:
+        position {dict}: position, as in positions.STANDARD_POSITIONS.
+        config {dict}: engine configuration (see tournament.make_player()).
+        repeat {int}: number of timed searches to max_depth.
+
+    Returns:
+        result {dict}: states visited, time and states visited per second of the deepest search,
+                       cumulative time and states visited to reach every depth, peak memory in
+                       bytes, and the move and value found.
+    """
+    board = Board.from_moves(position["moves"], position["size"], position["k"])
+    depth = config.get("max_depth", 5)
+
+    player = make_player(config)
+    time_to_depth, nodes_to_depth = [], []
+    elapsed = 0.0
+    nodes = 0
+    for search_depth in range(1, depth + 1):
+        player.states_visited = 0
+        start = time.perf_counter()
+        value, move = player.search(board, search_depth)
+        elapsed += time.perf_counter() - start
+        nodes += player.states_visited
+        time_to_depth.append(elapsed)
+        nodes_to_depth.append(nodes)
+
+    #garbage collection is paused while timing, as in timeit
+    search_time = float("inf")
+    for _ in range(repeat):
+        player = make_player(config)
+        player.states_visited = 0
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            player.search(board, depth)
+            search_time = min(search_time, time.perf_counter() - start)
+        finally:
+            gc.enable()
+    search_nodes = player.states_visited
+
+    player = make_player(config)
+    tracemalloc.start()
+    try:
+        player.search(board, depth)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "position": position["name"],
+        "phase": position["phase"],
+        "size": list(position["size"]),
+        "k": position["k"],
+        "depth": depth,
+        "nodes": search_nodes,
+        "time": search_time,
+        "nodes_per_second": search_nodes / search_time if search_time > 0 else None,
+        "time_to_depth": time_to_depth,
+        "nodes_to_depth": nodes_to_depth,
+        "peak_memory": peak_memory,
+        "move": move,
+        "value": value,
+    }
+
+
+def run_benchmark(positions=None, engines=None, repeat=3):
+    """Runs every engine on every position.
+
+    Args:
+        positions {list}: positions to search (defaults to positions.STANDARD_POSITIONS).
+        engines {dict}: engine configurations keyed by name (defaults to DEFAULT_ENGINES).
+        repeat {int}: number of timed searches per position (the fastest is reported).
+
+    Returns:
+        report {dict}: "meta" information about the run and the list of "results" (see
+                       benchmark_position()), each with the name of its "engine".
+    """
+    positions = STANDARD_POSITIONS if positions is None else positions
+    engines = DEFAULT_ENGINES if engines is None else engines
+
+    results = []
+    for name, config in engines.items():
+        for position in positions:
+            result = benchmark_position(position, config, repeat)
+            result["engine"] = name
+            results.append(result)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "engines": engines,
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def deep_size(obj, seen=None):
+    """Retrieves the number of bytes used by an object and everything it references (shared
+    objects are only counted once)."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    if hasattr(obj, "__dict__"):
+        size += deep_size(obj.__dict__, seen)
+    for name in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, name):
+            size += deep_size(getattr(obj, name), seen)
+    return size
+
+
+def memory_per_node(positions=None, depths=(6, 7)):
+    """Measures the memory used by the search per state visited.
+
+    Every position is searched by a fresh AlphaBetaPlayer whose transposition table is allocated
+    before tracemalloc starts, so the peak only counts what the search itself allocates (table
+    entries, board history, move lists...). The size of a copy of the board, as held by every
+    successor of get_actions(), is measured as well.
+
+    Args:
+        positions {list}: positions to search (defaults to the 7x6 standard positions).
+        depths {tuple}: search depths to measure.
+
+    Returns:
+        results {list}: one dictionary per depth with the states visited, the peak memory of the
+                        searches and the bytes per state visited, summed over all positions, and
+                        the mean size of a board copy in bytes.
+    """
+    if positions is None:
+        positions = get_positions(size=(7, 6), k=4)
+    boards = [Board.from_moves(position["moves"], position["size"], position["k"]) for position in positions]
+    board_bytes = sum(deep_size(board.copy()) for board in boards) / len(boards)
+
+    results = []
+    for depth in depths:
+        nodes, peak = 0, 0
+        for board in boards:
+            player = make_player({"type": "alphabeta", "max_depth": depth})
+            gc.collect()
+            tracemalloc.start()
+            try:
+                player.search(board, depth)
+                peak += tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            nodes += player.states_visited
+        results.append({"depth": depth, "nodes": nodes, "peak_memory": peak,
+                        "bytes_per_node": peak / nodes if nodes else None, "board_bytes": board_bytes})
+    return results
+
+
+def compare(report, baseline, time_tolerance=0.25, node_tolerance=0.0, min_time=0.005):
+    """Compares a benchmark report against a baseline report.
+
+    States visited, depths and moves are deterministic, so any change of them is a regression.
+    Search times of a few tens of milliseconds vary by up to ~50% between runs of the same
+    code, so slowdowns are reported apart, to be treated as advisory unless the searches are
+    long enough to time reliably.
+
+    Args:
+        report {dict}: report of run_benchmark().
+        baseline {dict}: earlier report to compare against.
+        time_tolerance {float}: relative slowdown of the search time allowed (0.25 for 25%).
+        node_tolerance {float}: relative increase of states visited allowed.
+        min_time {float}: slowdowns smaller than this many seconds are ignored as noise.
+
+    Returns:
+        regressions {list}: descriptions of the searches that visited more states than allowed
+                            (or changed their depth or selected move).
+        slowdowns {list}: descriptions of the searches that got slower than allowed.
+    """
+    baseline_results = {(result["engine"], result["position"]): result for result in baseline["results"]}
+    regressions, slowdowns = [], []
+    for result in report["results"]:
+        key = (result["engine"], result["position"])
+        if key not in baseline_results:
+            continue
+        old = baseline_results[key]
+        label = f"{result['engine']}/{result['position']}"
+        if old["depth"] != result["depth"]:
+            regressions.append(f"{label}: depth changed from {old['depth']} to {result['depth']}")
+            continue
+        if result["nodes"] > old["nodes"] * (1 + node_tolerance):
+            regressions.append(f"{label}: nodes {old['nodes']} -> {result['nodes']}")
+        if result["time"] > old["time"] * (1 + time_tolerance) and result["time"] - old["time"] > min_time:
+            slowdowns.append(f"{label}: time {old['time']:.4f}s -> {result['time']:.4f}s")
+        if result["move"] != old["move"]:
+            regressions.append(f"{label}: move changed from {old['move']} to {result['move']}")
+    return regressions, slowdowns
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the search players on the standard positions.")
+    parser.add_argument("--output", default=None, help="JSON file to write the report to (stdout by default)")
+    parser.add_argument("--baseline", default=None, help="JSON report to compare against")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="relative slowdown allowed")
+    parser.add_argument("--node-tolerance", type=float, default=0.0, help="relative increase of states visited allowed")
+    parser.add_argument("--min-time", type=float, default=0.005, help="slowdowns ignored as noise, in seconds")
+    parser.add_argument("--fail-on-time", action="store_true", help="fail on slowdowns too (they are only reported by default)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed searches per position")
+    parser.add_argument("--phase", default=None, help="only benchmark positions of this phase")
+    parser.add_argument("--engines", default=None, help="JSON dictionary of engine configurations keyed by name")
+    parser.add_argument("--memory", action="store_true", help="only measure the memory used per state visited")
+    args = parser.parse_args()
+
+    if args.memory:
+        print(f"{'depth':>5}{'nodes':>10}{'peak (bytes)':>14}{'bytes/node':>12}{'board (bytes)':>15}")
+        for result in memory_per_node(get_positions(phase=args.phase, size=(7, 6), k=4), depths=(6, 7)):
+            print(f"{result['depth']:>5}{result['nodes']:>10}{result['peak_memory']:>14}"
+                  f"{result['bytes_per_node']:>12.1f}{result['board_bytes']:>15.0f}")
+        sys.exit(0)
+
+    engines = json.loads(args.engines) if args.engines is not None else None
+    report = run_benchmark(get_positions(phase=args.phase), engines, args.repeat)
+
+    if args.output is not None:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=1)
+    else:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            regressions, slowdowns = compare(report, json.load(baseline_file), args.time_tolerance,
+                                             args.node_tolerance, args.min_time)
+        for regression in regressions:
+            print(regression, file=sys.stderr)
+        for slowdown in slowdowns:
+            print(f"{'' if args.fail_on_time else 'warning: '}{slowdown}", file=sys.stderr)
+        sys.exit(1 if regressions or (args.fail_on_time and slowdowns) else 0)
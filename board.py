@@ -1,109 +1,548 @@
-from copy import deepcopy
+from functools import lru_cache
 import numpy as np
 
+
+@lru_cache(maxsize=None)
+def get_windows(width, height, k):
+    """Retrieves every line of k consecutive cells (horizontal, vertical, and both 
+    diagonals) of a board, computed once per (width, height, k).
+    
+    Args:
+        width {int}: number of columns of the board.
+        height {int}: number of rows of the board.
+        k {int}: number of connected positions needed to win a game.
+        
+    Returns:
+        windows {np.ndarray}: read-only (n_windows, k) array of flat indices into 
+                              board.state.ravel() (index row*width + column).
+    """
+    windows = []
+    for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        for y in range(height):
+            for x in range(width):
+                end_x, end_y = x + dx*(k-1), y + dy*(k-1)
+                if 0 <= end_x < width and 0 <= end_y < height:
+                    windows.append([(y + dy*i)*width + x + dx*i for i in range(k)])
+
+    windows = np.array(windows, dtype=np.intp).reshape(-1, k)
+    windows.flags.writeable = False
+    return windows
+
+
+@lru_cache(maxsize=None)
+def get_cell_bits(width, height):
+    """Retrieves the bitboard position of every cell of a board, in the order of 
+    board.state.ravel() (bit x*(height+1) + y for cell (x, y))."""
+    cell_bits = np.array([x*(height+1) + y for y in range(height) for x in range(width)], dtype=np.intp)
+    cell_bits.flags.writeable = False
+    return cell_bits
+
+
+@lru_cache(maxsize=None)
+def get_cell_windows(width, height, k):
+    """Retrieves, for every cell of a board (in the order of board.state.ravel()), the indices
+    of the windows of get_windows() that contain it.""" 
+    cell_windows = [[] for _ in range(width * height)]
+    for index, window in enumerate(get_windows(width, height, k).tolist()):
+        for cell in window:
+            cell_windows[cell].append(index)
+    return tuple(tuple(windows) for windows in cell_windows)
+
+
+@lru_cache(maxsize=None)
+def get_window_weights(k):
+    """Retrieves the value of a window as a function of the number of pieces of a single player
+    in it (0 for an empty window, (80/k)^(n-1) for n pieces)."""
+    weights = np.array([0] + [(80/k)**(n-1) for n in range(1, k+1)])
+    weights.flags.writeable = False
+    return weights
+
+
+@lru_cache(maxsize=None)
+def get_zobrist_keys(width, height):
+    """Retrieves the Zobrist keys of a board: one random 64-bit integer per player and cell 
+    (in the order of board.state.ravel()). The generator is seeded, so keys (and therefore 
+    position hashes) are the same in every process."""
+    rng = np.random.default_rng(seed=width * 1000 + height)
+    keys = rng.integers(1, 2**63, size=(2, width * height), dtype=np.int64)
+    return tuple(tuple(player_keys) for player_keys in keys.tolist())
+
+
+def evaluate_batch(states, k):
+    """Calculates the heuristic value of a batch of positions in a single vectorized pass 
+    (see Board.evaluate() for the scoring).
+
+    Args:
+        states {np.ndarray}: (n, height, width) int8 array of board states (0 if empty, 1 if 
+                             Max() and 2 if Min(), row 0 at the bottom, as in Board.state).
+        k {int}: number of connected positions needed to win a game.
+
+    Returns:
+        values {np.ndarray}: (n,) array of heuristic values (positive values favour Max() and 
+                             negative values favour Min()).
+    """
+    num_states, height, width = states.shape
+    windows = get_windows(width, height, k)
+    cells = states.reshape(num_states, height * width)[:, windows]
+    max_count = np.count_nonzero(cells == 1, axis=2)
+    min_count = np.count_nonzero(cells == 2, axis=2)
+    weights = get_window_weights(k)
+
+    #windows holding pieces of a single player are worth their weight, blocked windows nothing
+    max_value = np.where(min_count == 0, weights[max_count], 0.0).sum(axis=1)
+    min_value = np.where(max_count == 0, weights[min_count], 0.0).sum(axis=1)
+    return max_value - min_value
+
+
 class Board():
-    """ Class representing the board of the player. 
-            
-    Acts as an interface between the player and its ships.
+    """ Class representing the board of the game.
+
+    The position is stored as a pair of bitboards (one integer mask per player) plus
+    a height counter per column. Cell (x, y) is mapped to bit x*(height+1) + y, so each
+    column holds height playable bits followed by an always-empty sentinel bit that
+    stops horizontal and diagonal shifts from wrapping between columns.
+
+    The heuristic score of the position is kept up to date by make_move() and unmake_move(),
+    which only rescore the windows (lines of k cells) that contain the cell played.
+
+    Boards are kept small since copies are made for every successor by get_actions(): 
+    attributes live in __slots__, column heights and window counts (never larger than the 
+    height of the board or k) are bytearrays, and lists of cells or characters are only built 
+    when asked for (max_player_cells, min_player_cells, print()).
     """
-    def __init__(self, size, k):
-        """ Initialises a Board given a list of ships. 
+    __slots__ = ("width", "height", "k", "masks", "heights", "recur_moves", "game_moves", "history",
+                 "winner", "_state", "window_counts", "score", "verify", "hash", "mirror_hash",
+                 "stride", "directions", "direction_shifts", "bottom_mask", "board_mask")
+
+    def __init__(self, size, k, verify=False):
+        """ Initialises an empty Board.
         
         Args:
             size (tuple[int, int]): (width, height) of the board (in terms of 
-                number of cells). Defaults to (10, 10).
+                number of cells).
             k (int): The number of connected positions (horizontally, diagonally, or vertically)
                 needed to win a game.
-                
-        Raises:
-            ValueError if the number of ships is False
+            verify (bool): If True, the incremental score is checked against a full 
+                recomputation (evaluate()) after every move. Defaults to False.
         """
         self.width = size[0]
         self.height = size[1]
-        
-        # Set of cells that have been checked for each player
-        # Used for visualising the board
-        self.state = np.zeros((self.height, self.width))
-        self.max_player_cells = []
-        self.min_player_cells = []
         self.k = k
+
+        #bitboards for Max() (index 0) and Min() (index 1), and number of pieces per column
+        self.masks = [0, 0]
+        self.heights = bytearray(self.width)
         self.recur_moves = 0
         self.game_moves = 0
+        self.history = [] #stack of (column index, recursion, previous winner, previous score) for every move made, used to undo moves
+        self.winner = 0 #1 if Max() has won, 2 if Min() has won, updated by make_move()
+        self._state = None #cached array representation, rebuilt lazily after a move
+
+        #number of pieces of each player in every window, and heuristic score of the position
+        num_windows = len(get_windows(self.width, self.height, self.k))
+        self.window_counts = [bytearray(num_windows), bytearray(num_windows)]
+        self.score = 0.0
+        self.verify = verify
+        self.hash = 0 #Zobrist hash of the position, updated by make_move() and unmake_move()
+        self.mirror_hash = 0 #Zobrist hash of the position mirrored left to right
+
+        #shift amounts for vertical, horizontal, and both diagonal directions
+        self.stride = self.height + 1
+        self.directions = (1, self.stride, self.stride - 1, self.stride + 1)
+        #multiples of each direction up to k-1 cells away, used by winning_cells()
+        self.direction_shifts = tuple(tuple(m * shift for m in range(1, self.k)) for shift in self.directions)
+
+        #bottom cell of every column and every cell of the board (sentinel bits excluded)
+        self.bottom_mask = sum(1 << (x * self.stride) for x in range(self.width))
+        self.board_mask = self.bottom_mask * ((1 << self.height) - 1)
+
+    @classmethod
+    def from_moves(cls, moves, size, k):
+        """Builds a board by playing a sequence of game moves from the empty board.
+
+        Args:
+            moves {list}: columns played (1-indexed, eg [4, 4, 5, 3]), or a move string of 
+                          one digit per move (eg "4453"), which can only describe boards up 
+                          to 9 columns wide.
+            size (tuple[int, int]): (width, height) of the board.
+            k (int): number of connected positions needed to win a game.
+
+        Returns:
+            board {Board()}: board holding the resulting state.
+            
+        Raises:
+            ValueError if a move is not a valid column."""
+        board = cls(size, k)
+        for move in moves:
+            col = int(move)
+            if not board.is_valid(col):
+                raise ValueError(f"Invalid move {col} in {moves!r}.")
+            board.make_move(board.get_cell(col))
+        return board
+
+    @property
+    def num_moves(self):
+        """Total number of pieces on the board (game and recursion moves)."""
+        return self.game_moves + self.recur_moves
+
+    @property
+    def state(self):
+        """Array representation of the board (0 if empty, 1 if Max() and 2 if Min()), 
+        indexed as state[row][column] with row 0 at the bottom."""
+        if self._state is None:
+            nbytes = (self.width * self.stride + 7) // 8
+            cell_bits = get_cell_bits(self.width, self.height)
+            state = np.zeros(self.width * self.height, dtype=np.int8)
+            for player, mask in enumerate(self.masks, 1):
+                bits = np.unpackbits(np.frombuffer(mask.to_bytes(nbytes, 'little'), dtype=np.uint8), bitorder='little')
+                state += player * bits[cell_bits].view(np.int8)
+            self._state = state.reshape(self.height, self.width)
+        return self._state
+
+    @property
+    def max_player_cells(self):
+        """List of cells occupied by Max()."""
+        return self._mask_to_cells(self.masks[0])
+
+    @property
+    def min_player_cells(self):
+        """List of cells occupied by Min()."""
+        return self._mask_to_cells(self.masks[1])
+
+    @property
+    def canonical_key(self):
+        """Key shared by the position and its mirror image (the smaller of their Zobrist 
+        hashes), used to look positions up in transposition tables and opening books."""
+        return min(self.hash, self.mirror_hash)
+
+    @property
+    def is_mirrored(self):
+        """True if the canonical key is the hash of the mirror image, in which case moves 
+        stored under the key must be mirrored (see mirror_move())."""
+        return self.mirror_hash < self.hash
+
+    def mirror_move(self, move):
+        """Retrieves the column mirroring a column (1-indexed) left to right."""
+        return self.width + 1 - move
+
+    def mirror(self, mask):
+        """Mirrors a bitboard left to right."""
+        column = (1 << self.height) - 1
+        mirrored = 0
+        for x in range(self.width):
+            mirrored |= ((mask >> (x * self.stride)) & column) << ((self.width - 1 - x) * self.stride)
+        return mirrored
+
+    def is_symmetric(self):
+        """Returns True if the position is its own mirror image, in which case mirrored moves 
+        lead to mirrored (and therefore equally valued) positions."""
+        return (self.hash == self.mirror_hash and self.mirror(self.masks[0]) == self.masks[0]
+                and self.mirror(self.masks[1]) == self.masks[1])
+
+    def _mask_to_cells(self, mask):
+        """Converts a bitboard into the list of (x, y) cells it contains."""
+        cells = []
+        while mask:
+            low_bit = mask & -mask
+            x, y = divmod(low_bit.bit_length() - 1, self.stride)
+            cells.append((x, y))
+            mask ^= low_bit
+        return cells
 
     def make_move(self, cell, recursion=False):
         """Makes a move on the Board() object.
         
+        The piece placed belongs to the player whose turn it is given the total number of
+        pieces on the board (1 if Max() and 2 if Min()).
+
         Args:
-            cell {tuple}: cell to place player piece in with player number.
-            recursion {bool}: bool to indicate if move number should be updated for recursion or gameplay."""
+            cell {tuple}: cell to place player piece in.
+            recursion {bool}: bool to indicate if move number should be updated for recursion or gameplay.
+            
+        Raises:
+            ValueError if the cell is not the next free cell of its column."""
 
         x,y = cell #extract cell coordinates
+        if not 0 <= x < self.width or y != self.heights[x] or y >= self.height:
+            raise ValueError(f"Cell {cell} is not a playable cell.")
 
-        #if moves are being made within recursion, update recursion moves to update
-        #piece that must be placed (1 if Max() and 2 if Min())
+        player = self.num_moves % 2 + 1
         if not recursion:
-            player = self.game_moves % 2 + 1
             self.game_moves += 1
         else:
-            player = self.recur_moves % 2 + 1
-            self.recur_moves +=1
-
-        self.state[y][x] = player #place 1 on board if Max() and 2 if Min())
+            self.recur_moves += 1
+
+        bit = x * self.stride + y
+        self.masks[player - 1] |= 1 << bit
+        self.heights[x] += 1
+        self.history.append((x, recursion, self.winner, self.score))
+        self._state = None
+
+        if not self.winner and self.is_winning_bit(self.masks[player - 1], bit):
+            self.winner = player
+
+        keys = get_zobrist_keys(self.width, self.height)[player - 1]
+        self.hash ^= keys[y * self.width + x]
+        self.mirror_hash ^= keys[y * self.width + self.width - 1 - x]
+        self._update_score(x, y, player)
+        if self.verify:
+            self.check_score()
+
+    def _update_score(self, x, y, player):
+        """Updates the window counts and the heuristic score after player has placed a piece 
+        in cell (x, y)."""
+        own = self.window_counts[player - 1]
+        other = self.window_counts[2 - player]
+        weights = get_window_weights(self.k)
+        sign = 1 if player == 1 else -1
+
+        delta = 0.0
+        for window in get_cell_windows(self.width, self.height, self.k)[y * self.width + x]:
+            count = own[window]
+            own[window] = count + 1
+            if not other[window]:
+                #window still only holds pieces of player
+                delta += weights[count + 1] - weights[count]
+            elif not count:
+                #window of the opponent is now blocked
+                delta += weights[other[window]]
+        self.score += sign * float(delta)
+
+    def unmake_move(self):
+        """Undoes the last move made on the Board() object (restoring counters, 
+        heights and bitboards to their state before the move).
         
-        if player == 1:
-            self.max_player_cells.append(cell)
+        Returns:
+            cell {tuple}: cell that has been emptied.
+            
+        Raises:
+            IndexError if there are no moves to undo."""
+        x, recursion, self.winner, self.score = self.history.pop()
+        if not recursion:
+            self.game_moves -= 1
         else:
-            self.min_player_cells.append(cell)
+            self.recur_moves -= 1
+
+        self.heights[x] -= 1
+        y = self.heights[x]
+        player = self.num_moves % 2 + 1
+        self.masks[player - 1] &= ~(1 << (x * self.stride + y))
+        self._state = None
+
+        keys = get_zobrist_keys(self.width, self.height)[player - 1]
+        self.hash ^= keys[y * self.width + x]
+        self.mirror_hash ^= keys[y * self.width + self.width - 1 - x]
+        own = self.window_counts[player - 1]
+        for window in get_cell_windows(self.width, self.height, self.k)[y * self.width + x]:
+            own[window] -= 1
+        if self.verify:
+            self.check_score()
+
+        return (x, y)
+
+    def evaluate(self):
+        """Calculates the heuristic value of the position from scratch by scoring every window 
+        of the board in a single vectorized pass over the precomputed window table.
+
+        A window that only contains pieces from one player is worth (80/k)^(n-1) for that player, 
+        where n is the number of pieces in it (with k=4: 1, 20 and 400 for one, two and three 
+        pieces). Windows containing pieces of both players are blocked and worth nothing.
+
+        Returns:
+            value {float}: heuristic value of the position (positive values favour Max() 
+                           and negative values favour Min()).
+        """
+        windows = get_windows(self.width, self.height, self.k)
+        cells = self.state.ravel()[windows]
+        max_count = np.count_nonzero(cells == 1, axis=1)
+        min_count = np.count_nonzero(cells == 2, axis=1)
+        weights = get_window_weights(self.k)
+
+        #add value of Max() windows and subtract value of Min() windows
+        value = weights[max_count[min_count == 0]].sum() - weights[min_count[max_count == 0]].sum()
+
+        return float(value)
+
+    def check_score(self):
+        """Checks the incrementally maintained score against a full recomputation.
+        
+        Raises:
+            RuntimeError if the two scores differ."""
+        expected = self.evaluate()
+        if not np.isclose(self.score, expected):
+            raise RuntimeError(f"Incremental score {self.score} does not match recomputed score {expected}.")
+
+    def copy(self):
+        """Returns an independent copy of the board."""
+        board = Board((self.width, self.height), self.k)
+        board.masks = self.masks[:]
+        board.heights = self.heights[:]
+        board.recur_moves = self.recur_moves
+        board.game_moves = self.game_moves
+        board.history = self.history[:]
+        board.winner = self.winner
+        board.window_counts = [counts[:] for counts in self.window_counts]
+        board.score = self.score
+        board.verify = self.verify
+        board.hash = self.hash
+        board.mirror_hash = self.mirror_hash
+        return board
 
     def is_valid(self, move):
         """Returns True if column (move) is a valid column to drop a piece in."""
-        return 0 in self.state[:,move-1]
+        return 1 <= move <= self.width and self.heights[move-1] < self.height
 
     def get_actions(self):
-        """Retrieves actions that are valid successor states to current board state."""
+        """Retrieves actions that are valid successor states to current board state
+        (as independent copies of the board, see successors() for the in-place version)."""
         actions = []
         for col in range(1,self.width+1):
             if self.is_valid(col):
-                action_node = deepcopy(self)
+                action_node = self.copy()
                 move_cell = action_node.get_cell(col)
                 action_node.make_move(move_cell, recursion=True)
                 actions.append((action_node, col))
 
         return actions
 
+    def successors(self, columns=None):
+        """Generator over the valid successor states of the current board state.
+
+        Each successor is made in place with make_move() before it is yielded and undone 
+        with unmake_move() when the generator is resumed or closed, so the same Board() 
+        object is yielded every time. Callers that stop iterating early must close() the 
+        generator before using the board again.
+
+        Args:
+            columns {list}: columns to try, in order (invalid columns are skipped). 
+                            Defaults to all columns from left to right.
+
+        Yields:
+            {tuple}: (board, column) with board holding the successor state reached by
+                     dropping a piece in column.
+        """
+        if columns is None:
+            columns = range(1,self.width+1)
+        for col in columns:
+            if self.is_valid(col):
+                self.make_move(self.get_cell(col), recursion=True)
+                try:
+                    yield self, col
+                finally:
+                    self.unmake_move()
+
     def is_full(self):
         """Returns true if the board is full (case terminal node where the game 
         ends with a draw)."""
-        return self.game_moves == int(self.width*self.height)
+        return self.num_moves == self.width * self.height
+
+    def is_winning_bit(self, mask, bit):
+        """Returns True if the piece at position bit of the bitboard mask is part of k aligned 
+        pieces, by walking at most k-1 cells each way along the four lines through it."""
+        for shift in self.directions:
+            streak = 1
+            for step in (shift, -shift):
+                pos = bit + step
+                while streak < self.k and pos >= 0 and mask >> pos & 1:
+                    streak += 1
+                    pos += step
+            if streak >= self.k:
+                return True
+        return False
+
+    def has_streak(self, mask):
+        """Returns True if the bitboard mask contains k aligned pieces in any direction
+        (full board scan, winner_check() only relies on the last move)."""
+        for shift in self.directions:
+            streak = mask
+            for i in range(1, self.k):
+                streak &= mask >> (shift * i)
+            if streak:
+                return True
+        return False
         
+    def winning_cells(self, position, mask):
+        """Retrieves the empty cells that would complete k aligned pieces for a player.
+
+        Args:
+            position {int}: bitboard of the player's pieces.
+            mask {int}: bitboard of all the pieces on the board.
+
+        Returns:
+            {int}: bitboard of the empty cells (playable now or not) where a piece of the 
+                   player would connect k pieces.
+        """
+        cells = 0
+        for shifts in self.direction_shifts:
+            #before[m] (after[m]) holds the cells followed (preceded) in this direction by m 
+            #pieces of the player, a cell is winning if before[j] and after[k-1-j] for some j
+            before = [-1]
+            after = [-1]
+            for shift in shifts:
+                before.append(before[-1] & (position >> shift))
+                after.append(after[-1] & (position << shift))
+            for j, run in enumerate(before):
+                cells |= run & after[-1 - j]
+        return cells & self.board_mask & ~mask
+
+    def playable_cells(self, mask):
+        """Retrieves the bitboard of the cells a piece can be dropped in (the lowest empty 
+        cell of every column that is not full), given the bitboard of all the pieces."""
+        return (mask + self.bottom_mask) & self.board_mask
+
+    def threats(self, player):
+        """Retrieves the empty cells where a piece of player (1 if Max() and 2 if Min()) would 
+        connect k pieces, as a bitboard (see winning_cells())."""
+        return self.winning_cells(self.masks[player - 1], self.masks[0] | self.masks[1])
+
+    def prune_moves(self, columns):
+        """Restricts the columns to search from the current state with the threats of both 
+        players: 
+            1. if the player to move can connect k pieces, only the first such column is kept.
+            2. if the opponent threatens to connect k pieces in a playable cell, only the first
+               column blocking a threat is kept (the opponent wins anyway if there are several).
+            3. otherwise, columns whose next cell lies directly under a threat of the opponent
+               are dropped, since the opponent would win by playing on top of them.
+        The columns are kept unchanged if every one of them would be dropped.
+
+        Args:
+            columns {list}: valid columns, in the order they should be searched.
+
+        Returns:
+            columns {list}: columns left to search, in the same order.
+        """
+        player = self.num_moves % 2
+        mask = self.masks[0] | self.masks[1]
+        stride = self.stride
+        heights = self.heights
+
+        own = self.winning_cells(self.masks[player], mask)
+        for col in columns:
+            if own >> ((col-1) * stride + heights[col-1]) & 1:
+                return [col]
+
+        opponent = self.winning_cells(self.masks[1 - player], mask)
+        if not opponent:
+            return columns
+        for col in columns:
+            if opponent >> ((col-1) * stride + heights[col-1]) & 1:
+                return [col]
+
+        #cells directly under an opponent threat (the shift never crosses columns since the 
+        #threat above a cell is in the same column)
+        under = opponent >> 1
+        safe = [col for col in columns if not under >> ((col-1) * stride + heights[col-1]) & 1]
+        return safe if safe else columns
+
     def winner_check(self):
         """ Check whether someone has won the game.
+
+        Wins are detected by make_move() around the cell just played, so this is a lookup.
         
         Returns:
             {int} : return 1 if Max() has won, 2 if Min() has won, and 0 if game is still in play. 
         """
-        #Column check
-        board = self.state
-        for col in range(self.width):
-            board_col = board[:,col]
-            winner = self.streak_check(board_col)
-            if winner > 0:
-                return winner
-        #Row check
-        for row in range(self.height):
-            board_row = board[row]
-            winner = self.streak_check(board_row)
-            if winner > 0:
-                return winner
-
-        diags = [board[::-1,:].diagonal(i) for i in range(-self.width+1,self.height)]
-        diags.extend(board.diagonal(i) for i in range(self.height-1,-self.width,-1))
-        all_diags = [n.tolist() for n in diags if len(n) >= self.k]
-        for diag in all_diags: 
-            winner = self.streak_check(diag) 
-            if winner > 0:
-                return winner
-        return 0
+        return self.winner
 
     def is_terminal(self):
         """Returns True if either player has won the game or if board is full (draw)."""
@@ -174,14 +613,8 @@ class Board():
             
         Returns:
             {tuple}: cell to place piece in, composed of column_nr-1 (python indexing begins with 0)
-                     and the nearest available row (first row containing a 0 from bottom of column)."""
-        column = self.state[:,column_nr-1]
-        if 1 in column or 2 in column:
-            y_coord = np.where(column)[0].max() + 1
-            cell = (column_nr-1, y_coord)
-            return cell
-        else: 
-            return (column_nr-1, 0)
+                     and the nearest available row (first empty row from bottom of column)."""
+        return (column_nr-1, self.heights[column_nr-1])
   
     def print(self):
         """ Visualise the board on the terminal.
@@ -0,0 +1,204 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from board import Board
+
+MAGIC = b"C4BOOK"
+VERSION = 2
+#magic, version, width, height, k, maximum ply, search depth and number of positions (32 bytes,
+#so that the array of keys that follows is 8-byte aligned)
+HEADER = struct.Struct("<6sHBBBBHQ10x")
+
+
+def book_positions(size, k, max_ply):
+    """Enumerates every position reachable from the empty board in at most max_ply moves.
+
+    Args:
+        size (tuple[int, int]): (width, height) of the board.
+        k {int}: number of connected positions needed to win a game.
+        max_ply {int}: maximum number of moves played.
+
+    Returns:
+        positions {list}: columns played (see Board.from_moves()) to reach the positions that 
+                          have not ended, one per distinct position (transpositions and mirror images 
+                          are only kept once).
+    """
+    positions = []
+    seen = set()
+    frontier = [[]]
+    for ply in range(max_ply + 1):
+        next_frontier = []
+        for moves in frontier:
+            board = Board.from_moves(moves, size, k)
+            if board.canonical_key in seen or board.is_terminal():
+                continue
+            seen.add(board.canonical_key)
+            positions.append(moves)
+            if ply < max_ply:
+                next_frontier.extend(moves + [col] for col in range(1, board.width+1) if board.is_valid(col))
+        frontier = next_frontier
+    return positions
+
+
+def _analyse_position(task):
+    """Finds the best move and value of a single book position (see generate_book())."""
+    from player import AlphaBetaPlayer
+
+    moves, size, k, depth = task
+    board = Board.from_moves(moves, size, k)
+    player = AlphaBetaPlayer(max_depth=depth, verbose=False)
+    move = player.select_target(board)
+    if board.is_mirrored:
+        move = board.mirror_move(move)
+    return board.canonical_key, move, player.search_stats["value"]
+
+
+def generate_book(path, size=(7, 6), k=4, max_ply=4, depth=8, workers=None, verbose=False):
+    """Writes an opening book: the best move and value of every position up to max_ply moves.
+
+    Positions close enough to the end of the game are solved exactly (see Solver), the others
+    are searched to a fixed depth by an AlphaBetaPlayer. Positions are analysed in a pool of
+    worker processes.
+
+    The file holds a header followed by three arrays of the same length: the canonical keys of
+    the positions (uint64, sorted, see Board.canonical_key), the best moves of the canonical 
+    positions (uint8) and the values for the player to move (float32,
+    +-inf for solved wins and losses). Columns are kept apart so that lookups can binary search
+    the memory-mapped keys without reading the rest of the file (see OpeningBook).
+
+    Args:
+        path {str}: file to write.
+        size (tuple[int, int]): (width, height) of the board.
+        k {int}: number of connected positions needed to win a game.
+        max_ply {int}: number of moves of the deepest positions in the book.
+        depth {int}: search depth of the positions that are not solved.
+        workers {int}: number of worker processes (defaults to the number of CPUs).
+        verbose {bool}: If True progress is printed to stderr.
+
+    Returns:
+        num_positions {int}: number of positions written.
+    """
+    positions = book_positions(size, k, max_ply)
+    tasks = [(moves, tuple(size), k, depth) for moves in positions]
+
+    entries = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        for entry in executor.map(_analyse_position, tasks, chunksize=4):
+            entries.append(entry)
+            if verbose and len(entries) % 100 == 0:
+                print(f"{len(entries)}/{len(tasks)} positions ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+    entries.sort()
+
+    keys = np.array([entry[0] for entry in entries], dtype="<u8")
+    best_moves = np.array([entry[1] for entry in entries], dtype=np.uint8)
+    values = np.array([entry[2] for entry in entries], dtype="<f4")
+    with open(path, "wb") as book_file:
+        book_file.write(HEADER.pack(MAGIC, VERSION, size[0], size[1], k, max_ply, depth, len(entries)))
+        book_file.write(keys.tobytes())
+        book_file.write(best_moves.tobytes())
+        book_file.write(values.tobytes())
+    return len(entries)
+
+
+class OpeningBook():
+    """ Read-only opening book written by generate_book().
+
+    The file is memory-mapped, so opening a book only reads its header: each lookup binary
+    searches the sorted keys, which only touches the few pages of the file it compares
+    against. Books are picklable (they are reopened from their path), so players using one
+    can be sent to worker processes.
+    """
+    def __init__(self, path):
+        """ Opens an opening book.
+
+        Args:
+            path {str}: file written by generate_book().
+
+        Raises:
+            ValueError if the file is not an opening book of a supported version.
+        """
+        self.path = path
+        with open(path, "rb") as book_file:
+            header = book_file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{path!r} is not an opening book.")
+        magic, version, width, height, k, max_ply, depth, count = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path!r} is not an opening book of version {VERSION}.")
+
+        self.width, self.height, self.k = width, height, k
+        self.max_ply = max_ply
+        self.depth = depth
+        self.count = count
+        self._map()
+
+    def _map(self):
+        """Memory-maps the arrays of the book."""
+        offset = HEADER.size
+        if self.count == 0:
+            self.keys = np.zeros(0, dtype="<u8")
+            self.moves = np.zeros(0, dtype=np.uint8)
+            self.values = np.zeros(0, dtype="<f4")
+            return
+        self.keys = np.memmap(self.path, dtype="<u8", mode="r", offset=offset, shape=(self.count,))
+        offset += 8 * self.count
+        self.moves = np.memmap(self.path, dtype=np.uint8, mode="r", offset=offset, shape=(self.count,))
+        offset += self.count
+        self.values = np.memmap(self.path, dtype="<f4", mode="r", offset=offset, shape=(self.count,))
+
+    def __len__(self):
+        return self.count
+
+    def __getstate__(self):
+        #memory maps are reopened from the path rather than copied
+        state = self.__dict__.copy()
+        for name in ("keys", "moves", "values"):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._map()
+
+    def lookup(self, board):
+        """Looks up the current state in the book.
+
+        Args:
+            board {Board()}: board object to indicate current state of game.
+
+        Returns:
+            {tuple}: (best move, value for the player to move) of the state, or None if the
+                     state is not in the book (or the book is for another board size or k).
+        """
+        if (board.width, board.height, board.k) != (self.width, self.height, self.k) or board.num_moves > self.max_ply:
+            return None
+        key = board.canonical_key
+        index = int(np.searchsorted(self.keys, np.uint64(key)))
+        if index == self.count or int(self.keys[index]) != key:
+            return None
+        move = int(self.moves[index])
+        return (board.mirror_move(move) if board.is_mirrored else move), float(self.values[index])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generates an opening book.")
+    parser.add_argument("output", help="file to write the book to")
+    parser.add_argument("--size", type=int, nargs=2, default=(7, 6), help="width and height of the board")
+    parser.add_argument("--k", type=int, default=4, help="number of connected pieces needed to win")
+    parser.add_argument("--plies", type=int, default=4, help="number of moves of the deepest positions")
+    parser.add_argument("--depth", type=int, default=8, help="search depth of the positions that are not solved")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    num_positions = generate_book(args.output, tuple(args.size), args.k, args.plies, args.depth, args.workers,
+                                  verbose=True)
+    print(f"{num_positions} positions written to {args.output} ({os.path.getsize(args.output)} bytes, "
+          f"{time.perf_counter() - start:.1f}s)", file=sys.stderr)
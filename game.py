@@ -5,7 +5,6 @@ from player import ManualPlayer, MiniMaxPlayer, AlphaBetaPlayer
 from board import Board
 import time
 import numpy as np
-import matplotlib.pyplot as plt
 
 class Game():
     """ Game class for performing game simulations.
@@ -17,65 +16,146 @@ class Game():
 
     """
 
-    def __init__(self, player1, player2, size=(7,7), k=4):
+    def __init__(self, player1, player2, size=(7,7), k=4, quiet=False, telemetry=None, eval_cache=None):
         """ Initialises a game.
         
         Args:
             player1 (Player): First player
             player2 (Player): Second player
+            quiet (bool): If True nothing is printed (neither the board nor the moves 
+                selected by the players).
+            telemetry (callable): Function called with the record of every move (see 
+                move_record()) as soon as it has been played. Defaults to None.
+            eval_cache (EvaluationCache): Evaluation cache given to both players (if they 
+                search), so that leaves evaluated by one are reused by the other. Defaults to 
+                None (players keep their own cache, if any).
         """
         self.player1 = player1
         self.player2 = player2
         self.k = k
         self.size = size
+        self.quiet = quiet
+        self.telemetry = telemetry
+        if eval_cache is not None:
+            for player in (player1, player2):
+                if hasattr(player, "eval_cache"):
+                    player.eval_cache = eval_cache
 
         self.max_player, self.min_player = self.select_starting_player()
         self.board = None
-        self.times_list = []
-        self.states_visited_list = []
+        self.records = [] #per-move records of the last game played
 
-    def initialize_game(self):
-        """Initialise board for game."""
-        self.board = Board(size=self.size, k=self.k)
+    @property
+    def times_list(self):
+        """Wall-clock time taken by each move of the last game."""
+        return [record["wall_time"] for record in self.records]
+
+    @property
+    def states_visited_list(self):
+        """Number of states visited by each move of the last game."""
+        return [record["states_visited"] for record in self.records]
+
+    def initialize_game(self, opening=""):
+        """Initialise board for game.
+        
+        Args:
+            opening (list): columns played before the game starts (see Board.from_moves())."""
+        self.board = Board.from_moves(opening, size=self.size, k=self.k)
+        self.records = []
     
-    def play(self, num_moves=None):
+    def play(self, num_moves=None, opening=""):
         """ Simulates an entire game. 
         
-        Prints out the necessary information. 
+        Prints out the necessary information unless the game is quiet. 
+
+        Args:
+            opening (list): columns played before the game starts (see Board.from_moves()).
+
+        Returns:
+            winner {int}: 1 if the starting player has won, 2 if the other player has won 
+                and 0 for a draw.
         """
-        print(f"{self.max_player} starts the game.")
+        self.initialize_game(opening) #initialize board for game 
         curr_player, waiter = self.max_player, self.min_player
-
-        self.initialize_game() #initialize board for game 
+        if self.board.num_moves % 2 == 1:
+            curr_player, waiter = waiter, curr_player
+
+        if not self.quiet:
+            print(f"{curr_player} starts the game.")
+        #players are silenced during a quiet game and restored afterwards
+        players = (self.max_player, self.min_player)
+        verbose = [getattr(player, "verbose", None) for player in players]
+        if self.quiet:
+            for player, flag in zip(players, verbose):
+                if flag is not None:
+                    player.verbose = False
             
-        # Simulates the game, until a player has lost
-        finished = False
-        while not finished:
-            self.drawboard()
-            print(f"{curr_player}, your turn:")
-
-            start = time.time()
-            target_col = curr_player.select_target(self.board)
-            target_cell = self.board.get_cell(target_col)
-            time_taken = time.time() - start
-            states_visited = curr_player.states_visited
-            self.states_visited_list.append(states_visited)
+        # Simulates the game, until a player has won or the board is full
+        try:
+            while not self.board.is_terminal():
+                if not self.quiet:
+                    self.drawboard()
+                    print(f"{curr_player}, your turn:")
+
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                target_col = curr_player.select_target(self.board)
+                target_cell = self.board.get_cell(target_col)
+                wall_time, cpu_time = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+                self.board.make_move(target_cell)
+
+                record = self.move_record(curr_player, target_col, wall_time, cpu_time)
+                self.records.append(record)
+                if self.telemetry is not None:
+                    self.telemetry(record)
+
+                curr_player, waiter = waiter, curr_player
+        finally:
+            for player, flag in zip(players, verbose):
+                if flag is not None:
+                    player.verbose = flag
+                #no use in pondering once the game is over
+                if hasattr(player, "stop_pondering"):
+                    player.stop_pondering()
 
-            self.times_list.append(time_taken)
-
-            self.board.make_move(target_cell)
-
-            # Game over if either player has lost
-            winner = self.board.winner_check()
+        # Show final results
+        winner = self.board.winner_check()
+        if not self.quiet:
+            self.drawboard()
             if winner > 0:
-                finished = True
+                print(f"{waiter} has won!")
             else:
-                curr_player, waiter = waiter, curr_player  
-            
+                print("The game is a draw!")
+        return winner
 
-        # Show final results
-        self.drawboard()
-        print(f"{curr_player} has won!")
+    def move_record(self, player, column, wall_time, cpu_time):
+        """Builds the telemetry record of a move that has just been played.
+
+        Args:
+            player (Player): player that made the move.
+            column (int): column played.
+            wall_time (float): wall-clock time taken to select the move, in seconds.
+            cpu_time (float): CPU time of the process while selecting the move, in seconds.
+
+        Returns:
+            record {dict}: move number, player, column, wall and CPU time, states visited, 
+                states visited per second, depth reached by the search and hit rate of the
+                transposition table (None when the player does not report them).
+        """
+        stats = getattr(player, "search_stats", None) or {}
+        states_visited = getattr(player, "states_visited", None)
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        return {
+            "move": self.board.num_moves,
+            "player": str(player),
+            "column": column,
+            "wall_time": wall_time,
+            "cpu_time": cpu_time,
+            "states_visited": states_visited,
+            "nodes_per_second": states_visited / wall_time if states_visited and wall_time > 0 else None,
+            "depth": stats.get("depth"),
+            "tt_hit_rate": stats["hits"] / lookups if lookups else None,
+        }
 
     def drawboard(self):
         """Draw board on terminal."""
@@ -96,6 +176,8 @@ class Game():
         return max_player, min_player
     
     def plot_states(self):
+        import matplotlib.pyplot as plt
+
         plt.figure()
         plt.plot(np.arange(len(self.states_visited_list)), self.states_visited_list)
         plt.xlabel("Episodes")
@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from server import GameServer, ServerError
+
+
+class SocketClient():
+    """ Client of a GameServer listening on a TCP socket (one JSON request per line)."""
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, request):
+        """Sends a request and returns the response, raising ServerError if it failed."""
+        self.writer.write((json.dumps(request) + "\n").encode())
+        await self.writer.drain()
+        response = json.loads(await self.reader.readline())
+        if not response["ok"]:
+            raise ServerError(response["error"])
+        return response
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+class InProcessClient():
+    """ Client calling a GameServer of the same process, with the same interface as SocketClient."""
+    def __init__(self, server, owner):
+        self.server = server
+        self.owner = owner
+
+    async def request(self, request):
+        response = await self.server.handle(request, self.owner)
+        if not response["ok"]:
+            raise ServerError(response["error"])
+        return response
+
+    async def close(self):
+        pass
+
+
+async def play_games(client, num_games, size, k, deadline, rng, latencies, errors):
+    """Plays games against the server with random moves, recording the latency of every move.
+
+    Args:
+        client {SocketClient()}: client to send the requests with.
+        num_games {int}: number of games to play.
+        size (tuple[int, int]): (width, height) of the board.
+        k {int}: number of connected positions needed to win a game.
+        deadline {float}: deadline of every engine move in seconds (None for no deadline).
+        rng {random.Random}: random number generator choosing the moves.
+        latencies {list}: list the latency of every move (in seconds) is appended to.
+        errors {list}: list the error of every failed request is appended to.
+    """
+    for _ in range(num_games):
+        state = await client.request({"op": "new", "size": list(size), "k": k})
+        heights = [0] * size[0]
+        while not state["finished"]:
+            for col in state["moves"][sum(heights):]:
+                heights[col-1] += 1
+            column = rng.choice([col for col in range(1, size[0]+1) if heights[col-1] < size[1]])
+            start = time.perf_counter()
+            try:
+                state = await client.request({"op": "move", "session": state["session"], "column": column,
+                                              "deadline": deadline})
+            except ServerError as error:
+                errors.append(str(error))
+                break
+            latencies.append(time.perf_counter() - start)
+        await client.request({"op": "close", "session": state["session"]})
+
+
+def percentile(values, fraction):
+    """Retrieves a percentile of a list of values (nearest rank)."""
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+async def run_load(concurrency, games_per_client=2, size=(7, 6), k=4, deadline=None, workers=None,
+                   engine=None, host=None, port=8765, seed=0):
+    """Plays games from concurrent clients and measures the latency of the engine moves.
+
+    Args:
+        concurrency {int}: number of clients playing at the same time (one game each at a time).
+        games_per_client {int}: number of games played by each client.
+        size (tuple[int, int]): (width, height) of the board.
+        k {int}: number of connected positions needed to win a game.
+        deadline {float}: deadline of every engine move in seconds (None for no deadline).
+        workers {int}: number of worker processes of the in-process server.
+        engine {dict}: engine configuration of the in-process server (see server.DEFAULT_ENGINE).
+        host {str}: address of a running server (None to start a server in this process and
+                    talk to it over a local socket).
+        port {int}: port of the server.
+        seed {int}: seed of the random moves.
+
+    Returns:
+        result {dict}: number of moves, errors, p50/p99/max latency in seconds and throughput
+                       in moves per second.
+    """
+    server = listener = None
+    if host is None:
+        server = GameServer(workers, engine)
+        await server.start()
+        listener = await server.serve("127.0.0.1", 0)
+        host, port = "127.0.0.1", listener.sockets[0].getsockname()[1]
+
+    latencies, errors = [], []
+    try:
+        clients = [await SocketClient.connect(host, port) for _ in range(concurrency)]
+        start = time.perf_counter()
+        await asyncio.gather(*(play_games(client, games_per_client, size, k, deadline, random.Random(seed + i),
+                                          latencies, errors) for i, client in enumerate(clients)))
+        elapsed = time.perf_counter() - start
+        for client in clients:
+            await client.close()
+    finally:
+        if listener is not None:
+            listener.close()
+            await listener.wait_closed()
+        if server is not None:
+            await server.close()
+
+    return {
+        "concurrency": concurrency,
+        "moves": len(latencies),
+        "errors": len(errors),
+        "p50": percentile(latencies, 0.50) if latencies else None,
+        "p99": percentile(latencies, 0.99) if latencies else None,
+        "max": max(latencies) if latencies else None,
+        "throughput": len(latencies) / elapsed,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measures move latency and throughput of the game server.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="concurrent games")
+    parser.add_argument("--games", type=int, default=2, help="games played by each client")
+    parser.add_argument("--size", type=int, nargs=2, default=(7, 6), help="width and height of the board")
+    parser.add_argument("--k", type=int, default=4, help="number of connected pieces needed to win")
+    parser.add_argument("--deadline", type=float, default=None, help="deadline of every engine move in seconds")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes of the in-process server")
+    parser.add_argument("--engine", default=None, help="JSON configuration of the engine of the in-process server")
+    parser.add_argument("--host", default=None, help="address of a running server (default: start one in-process)")
+    parser.add_argument("--port", type=int, default=8765, help="port of the running server")
+    args = parser.parse_args()
+
+    engine = json.loads(args.engine) if args.engine is not None else None
+    print(f"{'games':>6}{'moves':>7}{'errors':>7}{'p50 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}{'moves/s':>9}")
+    for concurrency in args.concurrency:
+        result = asyncio.run(run_load(concurrency, args.games, tuple(args.size), args.k, args.deadline,
+                                      args.workers, engine, args.host, args.port))
+        print(f"{result['concurrency']:>6}{result['moves']:>7}{result['errors']:>7}"
+              f"{1000 * result['p50']:>10.1f}{1000 * result['p99']:>10.1f}{1000 * result['max']:>10.1f}"
+              f"{result['throughput']:>9.1f}")
@@ -0,0 +1,148 @@
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def center_order(width):
+    """Retrieves the columns of a board ordered from the center outwards (left column first
+    when two columns are equally far from the center)."""
+    return tuple(sorted(range(1, width+1), key=lambda col: abs(2*col - (width+1))))
+
+
+class MoveOrdering():
+    """ Orders the moves searched at each node of an alpha-beta search.
+
+    Moves are tried in the following order:
+        1. the move of the principal variation of the previous iteration (if given).
+        2. the hash move, i.e. the best move stored in the transposition table.
+        3. the killer moves of the ply, i.e. the last moves that caused a beta cutoff at
+           the same depth in a sibling node.
+        4. the remaining moves, sorted by history score (how often and how deep dropping a
+           piece in that cell has caused a cutoff), ties broken by the static order.
+
+    The static order is center-out if center is True and left to right otherwise. Each
+    component can be switched off to measure how much it helps (see compare_orderings()).
+    """
+    def __init__(self, center=True, killers=True, history=True, hash_move=True, num_killers=2):
+        """ Initialises the move ordering.
+
+        Args:
+            center (bool): Order columns from the center outwards.
+            killers (bool): Try killer moves right after the hash move.
+            history (bool): Sort the remaining moves by history score.
+            hash_move (bool): Try the hash move first.
+            num_killers (int): Number of killer moves remembered per ply. Defaults to 2.
+        """
+        self.center = center
+        self.killers = killers
+        self.history = history
+        self.hash_move = hash_move
+        self.num_killers = num_killers
+
+        self.killer_moves = [] #killer moves for each depth (most recent first)
+        self.history_scores = {} #cutoff scores keyed by (player, cell index)
+
+    def new_search(self):
+        """Prepares the ordering for a new search: killer moves are forgotten and history
+        scores are halved so that older cutoffs weigh less."""
+        self.killer_moves = []
+        self.history_scores = {key: score // 2 for key, score in self.history_scores.items() if score > 1}
+
+    def order(self, board, depth, hash_move=None, pv_move=None):
+        """Orders the valid columns of the current state.
+
+        Args:
+            board {Board()}: board object to indicate current state of game.
+            depth {int}: current depth in search tree.
+            hash_move {int}: best move stored in the transposition table (None if not stored).
+            pv_move {int}: move of the previous principal variation (None if not on it).
+
+        Returns:
+            columns {list}: valid columns, in the order they should be searched.
+        """
+        columns = center_order(board.width) if self.center else range(1, board.width+1)
+        columns = [col for col in columns if board.heights[col-1] < board.height]
+
+        first = []
+        candidates = [pv_move]
+        if self.hash_move:
+            candidates.append(hash_move)
+        if self.killers and depth < len(self.killer_moves):
+            candidates.extend(self.killer_moves[depth])
+        for move in candidates:
+            if move is not None and move not in first and move in columns:
+                first.append(move)
+
+        rest = [col for col in columns if col not in first]
+        if self.history and self.history_scores:
+            player = board.num_moves % 2
+            scores = self.history_scores
+            heights = board.heights
+            width = board.width
+            rest.sort(key=lambda col: -scores.get((player, heights[col-1] * width + col-1), 0))
+
+        return first + rest
+
+    def record_cutoff(self, board, depth, move, remaining):
+        """Records a move that caused a beta cutoff.
+
+        Args:
+            board {Board()}: board object holding the state the move was played from.
+            depth {int}: depth of the state in the search tree.
+            move {int}: column that caused the cutoff.
+            remaining {int}: remaining search depth below the state.
+        """
+        if self.killers:
+            while len(self.killer_moves) <= depth:
+                self.killer_moves.append([])
+            killers = self.killer_moves[depth]
+            if move in killers:
+                killers.remove(move)
+            killers.insert(0, move)
+            del killers[self.num_killers:]
+
+        if self.history:
+            key = (board.num_moves % 2, board.heights[move-1] * board.width + move-1)
+            self.history_scores[key] = self.history_scores.get(key, 0) + remaining * remaining
+
+
+def compare_orderings(positions, depth=6):
+    """Compares the number of states visited by an alpha-beta search with each move ordering
+    component switched on in turn.
+
+    Args:
+        positions {list}: positions to search, as in positions.STANDARD_POSITIONS.
+        depth {int}: depth of every search.
+
+    Returns:
+        results {dict}: total states visited over all positions for each configuration.
+    """
+    from player import AlphaBetaPlayer
+    from board import Board
+
+    configurations = {
+        "left-to-right": dict(center=False, killers=False, history=False, hash_move=False),
+        "center": dict(center=True, killers=False, history=False, hash_move=False),
+        "center+killers": dict(center=True, killers=True, history=False, hash_move=False),
+        "center+killers+history": dict(center=True, killers=True, history=True, hash_move=False),
+        "center+killers+history+hash": dict(center=True, killers=True, history=True, hash_move=True),
+    }
+
+    results = {}
+    for name, options in configurations.items():
+        results[name] = 0
+        for position in positions:
+            board = Board.from_moves(position["moves"], position["size"], position["k"])
+            player = AlphaBetaPlayer(max_depth=depth, ordering=MoveOrdering(**options), verbose=False)
+            player.is_min = board.num_moves % 2 == 1
+            player.select_target(board)
+            results[name] += player.states_visited
+    return results
+
+
+if __name__ == '__main__':
+    from positions import get_positions
+
+    results = compare_orderings(get_positions(size=(7, 6), k=4), depth=6)
+    baseline = results["left-to-right"]
+    for name, states_visited in results.items():
+        print(f"{name:<30}{states_visited:>10}{states_visited / baseline:>8.1%}")
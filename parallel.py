@@ -0,0 +1,259 @@
+from concurrent.futures import ProcessPoolExecutor
+import math
+import multiprocessing
+import os
+import time
+
+from board import Board
+from ordering import MoveOrdering
+from player import AlphaBetaPlayer, SearchTimeout
+
+_shared_alpha = None #best root value found so far, shared between the worker processes
+_worker_players = {} #search player of each configuration, kept between tasks of a worker
+
+
+def _init_worker(shared_alpha):
+    """Stores the shared root bound in the worker process."""
+    global _shared_alpha
+    _shared_alpha = shared_alpha
+
+
+def _worker_player(config):
+    """Retrieves the search player of a configuration in the worker process, creating it (and
+    its transposition table) on first use."""
+    key = tuple(sorted((name, repr(value)) for name, value in config.items()))
+    if key not in _worker_players:
+        options = dict(config)
+        options["ordering"] = MoveOrdering(**options.pop("ordering"))
+        _worker_players[key] = AlphaBetaPlayer(verbose=False, **options)
+    return _worker_players[key]
+
+
+def _warm_up(config, workers):
+    """Creates the search player of a configuration in a worker process, then waits a little so
+    that the pool hands the other warm-up tasks to the other processes."""
+    _worker_player(config)
+    time.sleep(0.01 * workers)
+
+
+def _search_root_move(moves, size, k, move, depth, lower, config, time_limit):
+    """Searches a single root move in a worker process.
+
+    Args:
+        moves {list}: columns played from the empty board to reach the root state.
+        size (tuple[int, int]): (width, height) of the board.
+        k {int}: number of connected positions needed to win a game.
+        move {int}: root move to search.
+        depth {int}: depth of the search from the root.
+        lower {float}: lower bound known by the parent when the task was submitted (the value
+                       shared by the other workers is used instead if it is higher).
+        config {dict}: keyword arguments of the AlphaBetaPlayer doing the search.
+        time_limit {float}: time left for the search in seconds (None for no limit).
+
+    Returns:
+        move {int}: root move searched.
+        value {float}: value of the move for the player to move at the root, exact if it is
+                       greater than the bound used and an upper bound otherwise (None if the
+                       time limit was reached).
+        states_visited {int}: number of states visited by the search.
+    """
+    player = _worker_player(config)
+    board = Board.from_moves(moves, size, k)
+    player.check_snapshot(board)
+    board.make_move(board.get_cell(move), recursion=True)
+
+    #values equal to the shared bound must still be exact so that ties are broken as in the
+    #serial search, hence the bound is lowered to the previous representable float
+    if _shared_alpha is not None:
+        lower = max(lower, _shared_alpha.value)
+    lower = math.nextafter(lower, -float("inf"))
+
+    player.states_visited = 0
+    player.search_depth = depth
+    player._root_moves = board.num_moves - 1
+    player.pv = []
+    player._deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    player._budget_active = time_limit is not None
+    try:
+        value = -player.negamax(board, -float("inf"), -lower, 1)[0]
+    except SearchTimeout:
+        return move, None, player.states_visited
+    finally:
+        player._budget_active = False
+
+    if _shared_alpha is not None and value > lower:
+        with _shared_alpha.get_lock():
+            _shared_alpha.value = max(_shared_alpha.value, value)
+    return move, value, player.states_visited + 1
+
+
+class ParallelAlphaBetaPlayer(AlphaBetaPlayer):
+    """ Alpha-beta player splitting the root moves between processes.
+
+    The first root move (in move ordering order) is searched in the main process to get a bound
+    (young brothers wait), then the remaining root moves are searched in a pool of worker
+    processes with that bound. Workers publish the best exact root value they find through a
+    shared value, which later tasks use as a tighter bound. Values tied with the bound are kept
+    exact, so the move selected is the first best move in the serial order, as in the serial
+    search.
+    """
+    def __init__(self, name=None, max_depth=5, workers=None, **kwargs):
+        """ Initialises a parallel alpha-beta player.
+
+        Args:
+            name (str): Player's name
+            max_depth {int}: maximum depth allowed in searching for optimum action.
+            workers {int}: number of worker processes (defaults to the number of CPUs).
+            kwargs: other arguments of AlphaBetaPlayer.
+        """
+        super().__init__(name, max_depth, **kwargs)
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.shared_alpha = None
+        self.worker_config = {
+            "tt_entries": self.table.max_entries if self.table is not None else 0,
+            "tt_replacement": self.table.replacement if self.table is not None else "depth",
+            "pvs": self.pvs,
+            "threats": self.threats,
+            "batch_frontier": self.batch_frontier,
+            "snapshot": kwargs.get("snapshot"), #workers come up with the same warm caches
+            "ordering": {"center": self.ordering.center, "killers": self.ordering.killers,
+                         "history": self.ordering.history, "hash_move": self.ordering.hash_move,
+                         "num_killers": self.ordering.num_killers},
+        }
+
+    def start(self):
+        """Starts the worker processes (done automatically by the first search)."""
+        if self.executor is None:
+            self.shared_alpha = multiprocessing.Value("d", -float("inf"))
+            self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                                initargs=(self.shared_alpha,))
+
+    def warm_up(self):
+        """Starts the worker processes and waits until every one of them has created its search
+        player (and transposition table), so that the next search does not pay for it."""
+        self.start()
+        futures = [self.executor.submit(_warm_up, self.worker_config, self.workers) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        """Shuts the worker processes down."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getstate__(self):
+        #the pool and the shared bound only belong to the process that created them
+        state = super().__getstate__()
+        state["executor"] = None
+        state["shared_alpha"] = None
+        return state
+
+    def search(self, board, depth, alpha=-float("inf"), beta=float("inf")):
+        """Searches the current state to a fixed depth, splitting the root moves between the
+        worker processes (see SearchPlayer.search() for the arguments and return values)."""
+        self.search_depth = depth
+        if board.winner or board.is_full() or depth == 0:
+            return self.negamax(board, alpha, beta)
+        self.start()
+
+        hash_move = self.probe(board, alpha, beta, 0)[1]
+        columns = [col for col in self.order_moves(board, 0, hash_move) if board.is_valid(col)]
+
+        #young brothers wait: the eldest move is searched first to get a bound for the others
+        board.make_move(board.get_cell(columns[0]), recursion=True)
+        try:
+            self.states_visited += 1
+            best_value = -self.negamax(board, -beta, -alpha, 1)[0]
+        finally:
+            board.unmake_move()
+        best_move = columns[0]
+        if best_value >= beta or len(columns) == 1:
+            return best_value, best_move
+
+        self.shared_alpha.value = best_value
+        lower = max(alpha, best_value)
+        moves = [move[0] + 1 for move in board.history]
+        time_limit = None
+        if self._budget_active and self._deadline is not None:
+            time_limit = max(0.0, self._deadline - time.perf_counter())
+        futures = [self.executor.submit(_search_root_move, moves, (board.width, board.height), board.k,
+                                        col, depth, lower, self.worker_config, time_limit)
+                   for col in columns[1:]]
+
+        results = {}
+        for future in futures:
+            move, value, states_visited = future.result()
+            self.states_visited += states_visited
+            results[move] = value
+        if any(value is None for value in results.values()):
+            raise SearchTimeout()
+
+        #first best move in the serial order, as in the serial search
+        for col in columns[1:]:
+            if results[col] > best_value:
+                best_value, best_move = results[col], col
+
+        self.store(board, best_value, best_move, alpha, beta, 0)
+        return best_value, best_move
+
+
+def benchmark_speedup(depths=(5, 6, 7, 8), workers=(1, 2, 4, 8), positions=None):
+    """Measures the speedup of ParallelAlphaBetaPlayer over the serial AlphaBetaPlayer.
+
+    Every position is searched by fresh players, as in the serial search, but the worker
+    processes are warmed up (see ParallelAlphaBetaPlayer.warm_up()) before the search is timed.
+
+    Args:
+        depths {tuple}: search depths to measure.
+        workers {tuple}: numbers of worker processes to measure.
+        positions {list}: positions to search, as in positions.STANDARD_POSITIONS (defaults to
+                          the 7x6 standard positions).
+
+    Returns:
+        results {list}: one dictionary per (depth, workers) with the total time, the speedup over
+                        the serial search and whether every selected move matched the serial one.
+    """
+    from positions import get_positions
+
+    if positions is None:
+        positions = get_positions(size=(7, 6), k=4)
+    boards = [Board.from_moves(position["moves"], position["size"], position["k"]) for position in positions]
+
+    results = []
+    for depth in depths:
+        #players (and their tables) are created before timing, as the warmed-up workers are
+        players = [AlphaBetaPlayer(max_depth=depth, verbose=False) for _ in boards]
+        start = time.perf_counter()
+        serial_moves = [player.select_target(board) for player, board in zip(players, boards)]
+        serial_time = time.perf_counter() - start
+
+        for num_workers in workers:
+            moves = []
+            parallel_time = 0.0
+            for board in boards:
+                #fresh players (and worker tables) for every position, as in the serial search
+                with ParallelAlphaBetaPlayer(max_depth=depth, workers=num_workers, verbose=False) as player:
+                    player.warm_up()
+                    start = time.perf_counter()
+                    moves.append(player.select_target(board))
+                    parallel_time += time.perf_counter() - start
+            results.append({"depth": depth, "workers": num_workers, "serial_time": serial_time,
+                            "parallel_time": parallel_time, "speedup": serial_time / parallel_time,
+                            "same_moves": moves == serial_moves})
+    return results
+
+
+if __name__ == '__main__':
+    print(f"{'depth':>5}{'workers':>9}{'serial (s)':>12}{'parallel (s)':>14}{'speedup':>9}  same moves")
+    for result in benchmark_speedup():
+        print(f"{result['depth']:>5}{result['workers']:>9}{result['serial_time']:>12.2f}"
+              f"{result['parallel_time']:>14.2f}{result['speedup']:>9.2f}  {result['same_moves']}")
@@ -1,6 +1,16 @@
-from board import Board
+import copy
+import math
+import threading
+import time
+from board import Board, evaluate_batch
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from ordering import MoveOrdering
+from solver import Solver
+from book import OpeningBook
+from snapshot import load_snapshot, read_header
 import numpy as np
 
+
 class Player():
     """ Class representing the player
     """
@@ -22,99 +32,29 @@ class Player():
     def __str__(self):
         return self.name
 
-    def _get_diagonals(self,board,row,col):
-        """Retrieves positive and negative diagonals from a cell in a grid.
-        
-        Args:
-            board {Board()}: current board state.
-            row {int}: row of cell to evaluate
-            col {int}: column of cell to evaluate
-        
-        Returns:
-            diags {list}: Positive and negative diagonal arrays that cross at the cell (row,col).
-        
-        """
-
-        pos_diag1 = np.fliplr(np.flipud(board.state[:row+1,:col+1])).diagonal()[::-1] #first half of positive diagonal
-        pos_diag2 = board.state[-(board.height-row):,-(board.width-col):].diagonal()[1:] #second half
-
-        #concatenate both halves to get full positive diagonal from point
-        pos_diag = np.concatenate((pos_diag1, pos_diag2)) 
-
-        neg_diag1 = np.flipud(board.state[:row+1, col:]).diagonal()#first half of negative diagonal
-        neg_diag2 = np.fliplr(board.state[-(board.height-row):,:-(board.width-col-1)]).diagonal()[1:][::-1] #second half
-
-        #concatenate both halves to get full positive diagonal from point
-        neg_diag = np.concatenate((neg_diag2, neg_diag1))
-
-        diags = [pos_diag, neg_diag] #input diagonals in list
-
-        return diags
-
-    def get_value(self, board, line):
-        """Retrieves value of a row, column, or diagonal (line) from the disctionary
-        containing the streaks within it. 
+    def heuristic(self, board):
+        """Retrieves the heuristic value of a specific state, which the board keeps up to date 
+        incrementally as moves are made and undone (see Board.evaluate() for the scoring).
         
         Args:
-            board {Board()}: current board state.
-            line {np.ndarray}: array containing row, column or diagonal to evaluate.
-
+            board {Board()}: board object to indicate current state of game.
+            
         Returns:
-            value {int}: Evaluated value of heuristic from row, column or diagonal as input. 
-        """
-        value = 0
-        streaks_dict = board.streak_check_heuristic(line)
-        for player, streaks in streaks_dict.items(): 
-            for streak in streaks:
-                 #exponentially higher value for larger assigned to larger streaks
-                if player == "Max":
-                    value += (80/board.k)**(streak-1) #add for Max() player streaks.
-
-                elif player == "Min":
-                    value -= (80/board.k)**(streak-1) #subtract for Min() player streaks.
+            value {float}: Evaluated value of heuristic from current state of board (positive 
+                           values favour Max() and negative values favour Min()). """
+        return board.score
 
-        return value
-    
-    def heuristic(self, board):
-        """Calculates the heuristic value of a specific state for the current player (Min or Max) by iterating
-        over all columns, rows, and diagonals of each cell and calculating a value for them. 
-
-           Value of streaks are: 
-                - one: 2
-                - two: 20
-                - three: 400
+    def heuristic_batch(self, states, k):
+        """Retrieves the heuristic values of a batch of states in one vectorized call (must 
+        agree with heuristic()).
         
         Args:
-            board {Board()}: board object to indicate current state of game.
+            states {np.ndarray}: (n, height, width) int8 array of board states (see Board.state).
+            k {int}: number of connected positions needed to win a game.
             
         Returns:
-            value {int}: Evaluated value of heuristic from current state of board. """
-
-        value = 0
-        state = board.state #initialise board state
-        #calculate heuristic by considering each players' current streaks
-        # ---> heuristic is calculated as +-10^{streak-1}, where the + corresponds to Max() and - to Min()
-        #check horizontal streaks
-        for row in range(board.height):
-            board_row = state[row,:]
-            value += self.get_value(board, board_row)
-
-        #check vertical streaks
-        for col in range(board.width):
-            board_col = state[:,col]
-            value += self.get_value(board, board_col)
-
-        #check diagonal streaks
-        for col in range(board.height):
-            for row in range(board.width):
-                diags = self._get_diagonals(board,row,col)
-                for board_diag in diags:
-                    #only interested in adding value to diagonals that allow 
-                    #for the successor states to be terminal
-                    if len(board_diag) >= board.k: 
-                        value += self.get_value(board, board_diag)
-
-        return value
+            values {np.ndarray}: (n,) array of heuristic values (positive values favour Max())."""
+        return evaluate_batch(states, k)
 
     
     def select_target(self):
@@ -129,233 +69,684 @@ class Player():
         raise NotImplementedError
 
 
-class MiniMaxPlayer(Player):
-    def __init__(self, max_depth=5, name=None):
+class SearchTimeout(Exception):
+    """Raised inside a search when the time or node budget of the move has been used up."""
+
+
+class SearchPlayer(Player):
+    """ Player selecting moves with a negamax search.
+
+    Values are always returned from the point of view of the player to move at the searched node
+    (positive values favour them): the heuristic of the board (which favours Max()) is negated 
+    for Min(), a state where the previous player has connected k pieces is worth -inf and a full 
+    board is a draw worth 0. Bounds are fail-soft, so values outside (alpha, beta) are still 
+    valid bounds on the true value.
+
+    With pruning, the search is alpha-beta; with pvs, every move after the first is searched with 
+    a zero-width window first and only re-searched with the full window if it beats alpha 
+    (principal variation search). MiniMaxPlayer and AlphaBetaPlayer are configurations of 
+    this class.
+    """
+    def __init__(self, name=None, max_depth=5, pruning=True, pvs=True, aspiration=None, 
+                 tt_entries=2**20, tt_replacement="depth", time_limit=None, node_limit=None, 
+                 ordering=None, verbose=True, solver_threshold=None, book=None, threats=True,
+                 eval_cache=None, batch_frontier=False, ponder=None, snapshot=None, profiler=None):
+        """ Initialises a search player.
+
+        If a time or node budget is given, moves are selected by iterative deepening (depth 1, 2, ... 
+        up to max_depth) and the best move of the deepest fully completed iteration is played. 
+        Otherwise a single search to max_depth is run.
+
+        Args:
+            name (str): Player's name
+            max_depth {int}: maximum depth allowed in searching for optimum action.
+            pruning {bool}: If True, prune with alpha-beta bounds.
+            pvs {bool}: If True (and pruning), use principal variation search.
+            aspiration {float}: half-width of the aspiration window centred on the previous 
+                                iteration's value in iterative deepening (None for full windows).
+            tt_entries {int}: maximum number of entries of the transposition table (0 to search 
+                              without a transposition table).
+            tt_replacement {str}: replacement policy of the transposition table ("depth", 
+                                  "always" or "two-tier").
+            time_limit {float}: wall-clock budget per move in seconds (None for no limit).
+            node_limit {int}: maximum number of states visited per move (None for no limit).
+            ordering {MoveOrdering()}: move ordering used in the search (defaults to 
+                                       MoveOrdering() with every component enabled).
+            verbose {bool}: If True the selected move is printed.
+            solver_threshold {int}: number of empty cells from which the position is solved 
+                                    exactly by a Solver() instead of searched (None to never 
+                                    solve).
+            book {OpeningBook()}: opening book consulted before searching (or the path of 
+                                  its file, None for no book).
+            threats {bool}: If True, only winning or blocking moves are searched when there 
+                            are any, and moves under a threat of the opponent are not searched 
+                            (see Board.prune_moves()).
+            eval_cache {EvaluationCache()}: cache of the heuristic evaluations of the leaves, 
+                                            which may be shared with other players (None to 
+                                            evaluate every leaf).
+            batch_frontier {bool}: If True, the children of frontier nodes (one move above 
+                                   the search depth) are all generated and evaluated together 
+                                   with heuristic_batch() (see frontier()).
+            ponder {str}: "predicted" to search the predicted reply of the opponent in a 
+                          background thread while waiting for it, "all" to search every reply 
+                          in turn, None not to ponder (see start_pondering()).
+            snapshot {str}: file the transposition table and evaluation cache are loaded 
+                            from (see snapshot.save_snapshot(), None to start empty). Its 
+                            board size and k are checked against the first board searched.
+            profiler {SearchProfiler()}: profiler measuring every move selected (None not to 
+                                         measure anything, see profiler.SearchProfiler).
+
+        Raises:
+            ValueError if the ponder mode is unknown, or the snapshot can not be loaded.
+        """
         super().__init__(name)
 
         self.max_depth = max_depth
         self.is_min = None
         self.states_visited = 0
 
-
-    def max(self, board, depth=0):
-        """Function used to recursively retrieve heuristic from a node that corresponds to 
-        Max()'s turn by using the raw MiniMax algorithm.
+        self.pruning = pruning
+        self.pvs = pvs and pruning
+        self.aspiration = aspiration
+        self.table = TranspositionTable(tt_entries, tt_replacement) if tt_entries else None
+        self.search_stats = {} #states visited, depth, value and transposition table counters of the last search
+
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.search_depth = max_depth #depth of the current iteration
+        self.pv = [] #principal variation (columns) of the last completed iteration
+        self._root_moves = 0 #number of moves on the board at the root of the search
+        self._deadline = None
+        self._budget_active = False
+
+        self.ordering = ordering if ordering is not None else MoveOrdering()
+        self.threats = threats
+        self.eval_cache = eval_cache
+        self.batch_frontier = batch_frontier
+
+        if ponder not in (None, "predicted", "all"):
+            raise ValueError(f"Unknown ponder mode {ponder!r}, expected None, 'predicted' or 'all'.")
+        self.ponder = ponder
+        self._cancel = None #event stopping the search of a pondering copy of the player
+        self._ponder_thread = None
+        self._ponder_cancel = None
+        self._ponder_results = {} #(move, value, depth) of the positions pondered, keyed by hash
+        self.verbose = verbose
+
+        self.solver_threshold = solver_threshold
+        self.solver = None #created by the first solved position
+        self.book = OpeningBook(book) if isinstance(book, str) else book
+        self._snapshot_game = None #(width, height, k) of the snapshot loaded, until checked by check_snapshot()
+        if snapshot is not None:
+            load_snapshot(snapshot, self)
+            self._snapshot_game = read_header(snapshot)[:3]
+        self.profiler = profiler
+
+    def probe(self, board, alpha, beta, depth):
+        """Looks up the current state in the transposition table.
         
         Args:
             board {Board()}: board object to indicate current state of game.
+            alpha {float}: value already secured by the player to move.
+            beta {float}: value the opponent can hold the player to move to.
             depth {int}: current depth in search tree. 
-        
-        Returns: 
-            best_value {int}: best value evaluated from child nodes. 
-            best_move {int}: best action to be taken from current node. 
+
+        Returns:
+            stored {tuple}: (value, move) stored for the state if it was searched at least as deep 
+                            and its value is exact or its bound already causes a cutoff in 
+                            (alpha, beta), None otherwise.
+            hash_move {int}: best move stored for the state (None if not stored).
         """
-        if board.is_terminal():
-            return -float("inf"), None
-        elif depth == self.max_depth:
-            return self.heuristic(board), None
-        #elif board.game_moves == 0:
-        #    return self.heuristic(board), board.width // 2 + 1
+        if self.table is None:
+            return None, None
+        entry = self.table.probe(board.canonical_key)
+        if entry is None:
+            return None, None
+
+        _, entry_depth, value, flag, move = entry
+        if move is not None and board.is_mirrored:
+            move = board.mirror_move(move)
+        if depth > 0 and entry_depth >= self.search_depth - depth:
+            if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                return (value, move), move
+        return None, move
+
+    def store(self, board, value, move, alpha, beta, depth):
+        """Stores the result of searching the current state with window (alpha, beta)."""
+        if self.table is None:
+            return
+        if value <= alpha:
+            flag = UPPER
+        elif value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        #a position and its mirror image share their entry, moves are stored for the canonical one
+        if move is not None and board.is_mirrored:
+            move = board.mirror_move(move)
+        self.table.store(board.canonical_key, self.search_depth - depth, value, flag, move)
+
+    def order_moves(self, board, depth, hash_move):
+        """Orders the columns to search from the current state with the move ordering, passing 
+        the move of the previous iteration's principal variation if the state lies on it. 
+        The right half of the root moves is left out when the root is symmetric, and columns 
+        are then pruned with the threats of both players (if threats is True).
 
-        #initialise best value to be infinite and negative such that any action will be chosen at first
-        best_value = -float("inf")  
-        best_move = None
+        Args:
+            board {Board()}: board object to indicate current state of game.
+            depth {int}: current depth in search tree. 
+            hash_move {int}: best move stored in the transposition table (None if not stored).
 
-        #iterate over all valid actions and retrieve best score and thus move
-        actions = board.get_actions()
-        for action in actions:
-            self.states_visited += 1
-            next_state, move = action
-            val = self.min(next_state, depth+1)[0]
+        Returns:
+            columns {list}: ordered columns.
+        """
+        pv_move = None
+        if depth < len(self.pv):
+            path = [move[0] + 1 for move in board.history[self._root_moves:]]
+            if path == self.pv[:depth]:
+                pv_move = self.pv[depth]
+        columns = self.ordering.order(board, depth, hash_move, pv_move)
+
+        #mirrored root moves of a symmetric position are worth the same, only one is searched 
+        #(before pruning, which could otherwise keep a single forced move on the right half)
+        if depth == 0 and board.is_symmetric():
+            columns = [col for col in columns if col <= board.mirror_move(col)]
+
+        #threats are not analysed at the frontier, where the children are evaluated anyway
+        if self.threats and self.search_depth - depth > 1:
+            columns = board.prune_moves(columns)
+        return columns
+
+    def check_snapshot(self, board):
+        """Checks that the snapshot the player was loaded from (if any) was saved for the size 
+        and k of the boards it searches, the first time a board is searched.
+
+        Raises:
+            ValueError if the snapshot was saved for another board size or k.
+        """
+        if self._snapshot_game is None:
+            return
+        width, height, k = self._snapshot_game
+        if (board.width, board.height, board.k) != (width, height, k):
+            raise ValueError(f"The snapshot loaded was saved for {width}x{height} boards with k={k}, "
+                             f"not {board.width}x{board.height} with k={board.k}.")
+        self._snapshot_game = None
+
+    def check_budget(self):
+        """Raises SearchTimeout if the time or node budget of the current move has been used up."""
+        if self.node_limit is not None and self.states_visited >= self.node_limit:
+            raise SearchTimeout()
+        if self._deadline is not None and self.states_visited % 256 == 0 and time.perf_counter() >= self._deadline:
+            raise SearchTimeout()
+        if self._cancel is not None and self._cancel.is_set():
+            raise SearchTimeout()
+
+    def __getstate__(self):
+        #a pondering search (and a profiler) only belongs to the process that started it
+        state = self.__dict__.copy()
+        state["_cancel"] = None
+        state["_ponder_thread"] = None
+        state["_ponder_cancel"] = None
+        state["_ponder_results"] = {}
+        state["profiler"] = None
+        return state
+
+    def start_pondering(self, board, move):
+        """Starts searching, in a background thread, the positions the opponent may leave after 
+        move is played: only the predicted reply (the second move of the principal variation, 
+        or every reply if there is no prediction) or every reply in turn, depending on the 
+        ponder mode. Each position is searched with increasing depths up to max_depth by a copy 
+        of the player sharing its transposition table, until stop_pondering() is called.
 
-            if val > best_value:
-                best_value = val
-                best_move = move
+        Args:
+            board {Board()}: board object holding the state move is played from (left as is).
+            move {int}: move selected by the player.
+        """
+        self.stop_pondering()
+        position = board.copy()
+        position.make_move(position.get_cell(move), recursion=True)
+        if position.is_terminal():
+            return
+
+        replies = [col for col in self.ordering.order(position, 1) if position.is_valid(col)]
+        if self.ponder == "predicted":
+            pv = self.principal_variation(board, move)
+            if len(pv) > 1:
+                replies = [pv[1]]
+
+        ponderer = copy.copy(self)
+        ponderer.ponder = None
+        ponderer.verbose = False
+        ponderer.node_limit = None #pondering only stops when cancelled (see stop_pondering())
+        ponderer._cancel = self._ponder_cancel = threading.Event()
+        self._ponder_thread = threading.Thread(target=self._ponder, args=(ponderer, position, replies), daemon=True)
+        self._ponder_thread.start()
+
+    def _ponder(self, ponderer, position, replies):
+        """Searches the positions reached by each reply (see start_pondering()), recording the 
+        result of every completed iteration."""
+        ponderer._budget_active = True
+        for reply in replies:
+            position.make_move(position.get_cell(reply), recursion=True)
+            try:
+                empty_cells = position.width * position.height - position.num_moves
+                if position.is_terminal() or (self.solver_threshold is not None and empty_cells <= self.solver_threshold):
+                    continue
+                ponderer._root_moves = position.num_moves
+                ponderer.pv = []
+                for depth in range(1, min(self.max_depth, empty_cells) + 1):
+                    ponderer.states_visited = 0
+                    value, best_move = ponderer.search(position, depth)
+                    #a proven result will not change with deeper searches
+                    proven = abs(value) == float("inf")
+                    self._ponder_results[position.hash] = (best_move, value, self.max_depth if proven else depth)
+                    ponderer.pv = ponderer.principal_variation(position, best_move)
+                    if proven:
+                        break
+            except SearchTimeout:
+                return
+            finally:
+                position.unmake_move()
+
+    def stop_pondering(self):
+        """Cancels the background search started by start_pondering() (if any) and waits for it 
+        to stop."""
+        thread = self._ponder_thread
+        if thread is not None:
+            self._ponder_cancel.set()
+            thread.join()
+            self._ponder_thread = None
+            self._ponder_cancel = None
+
+    def evaluate(self, board):
+        """Retrieves the heuristic value of a leaf (positive values favour Max()), from the 
+        evaluation cache if the position (or its mirror image) has already been evaluated."""
+        if self.eval_cache is None:
+            return self.heuristic(board)
+        key = board.canonical_key
+        value = self.eval_cache.get(key)
+        if value is None:
+            value = self.heuristic(board)
+            self.eval_cache.put(key, value)
+        return value
 
-        #print(best_value, best_move)
+    def frontier(self, board, columns):
+        """Retrieves the value of a frontier node (whose children are leaves) by building the 
+        states of all its children from the state of the node and scoring them with a single 
+        heuristic_batch() call. Children are not cut off by alpha-beta bounds, so the value 
+        returned is exact.
 
-        return best_value, best_move
+        Args:
+            board {Board()}: board object holding the frontier state.
+            columns {list}: ordered columns to play from the state.
 
-    def min(self, board, depth=0):
-        """Function used to recursively retrieve heuristic from a node that corresponds to 
-        Min()'s turn by using the raw MiniMax algorithm.
+        Returns:
+            best_value {float}: value of the state for the player to move.
+            best_move {int}: first of the best columns.
+        """
+        self.states_visited += len(columns)
+        if self._budget_active:
+            self.check_budget()
+
+        player = board.num_moves % 2
+        mask = board.masks[player]
+        full = board.num_moves + 1 == board.width * board.height
+        values = [None] * len(columns)
+        leaves = []
+        for i, col in enumerate(columns):
+            x, y = board.get_cell(col)
+            bit = x * board.stride + y
+            if board.is_winning_bit(mask | (1 << bit), bit):
+                values[i] = float("inf")
+            elif full:
+                values[i] = 0.0
+            else:
+                leaves.append((i, x, y))
+
+        if leaves:
+            indices, xs, ys = zip(*leaves)
+            states = np.repeat(board.state[np.newaxis], len(leaves), axis=0)
+            states[np.arange(len(leaves)), ys, xs] = player + 1
+            #values are for the player to move at the frontier, the heuristic favours Max()
+            scores = self.heuristic_batch(states, board.k)
+            sign = 1.0 if player == 0 else -1.0
+            for i, score in zip(indices, scores.tolist()):
+                values[i] = sign * score
+
+        best = max(range(len(columns)), key=lambda i: (values[i], -i))
+        return values[best], columns[best]
+
+    def negamax(self, board, alpha, beta, depth=0):
+        """Function used to recursively retrieve the value of a node for the player to move.
         
         Args:
             board {Board()}: board object to indicate current state of game.
+            alpha {float}: value already secured by the player to move.
+            beta {float}: value the opponent can hold the player to move to.
             depth {int}: current depth in search tree. 
         
         Returns: 
-            best_value {int}: best value evaluated from child nodes. 
+            best_value {float}: best value evaluated from child nodes. 
             best_move {int}: best action to be taken from current node. 
         """
-        if board.is_terminal():
-            return float("inf"), None
-        elif depth == self.max_depth:
-            return self.heuristic(board), None
-
-        #initialise best value to be infinite and positive such that any action will be chosen at first
-        best_value = float("inf")
+        if board.winner:
+            return -float("inf"), None
+        elif board.is_full():
+            return 0.0, None
+        elif depth == self.search_depth:
+            value = self.evaluate(board)
+            return (value if board.num_moves % 2 == 0 else -value), None
+
+        stored, hash_move = self.probe(board, alpha, beta, depth)
+        if stored is not None:
+            return stored
+        alpha_orig = alpha
+        
+        #initialise best value to be infinite and 
+        #negative such that any action will be chosen at first
+        best_value = -float("inf")  
         best_move = None
 
+        columns = self.order_moves(board, depth, hash_move)
+        if self.batch_frontier and depth == self.search_depth - 1:
+            best_value, best_move = self.frontier(board, columns)
+            self.store(board, best_value, best_move, alpha_orig, beta, depth)
+            return best_value, best_move
+
         #iterate over all possible actions and retrieve best score and thus move
-        actions = board.get_actions()
-        for action in actions:
-            self.states_visited += 1
-            next_state, move = action
-            #child_state.print()
-            val = self.max(next_state, depth+1)[0]
-
-            if val < best_value:
-                best_value = val
-                best_move = move
-        
-        #print(best_value, best_move)
+        actions = board.successors(columns)
+        try:
+            for next_state, move in actions:
+                self.states_visited += 1
+                if self._budget_active:
+                    self.check_budget()
+
+                if not self.pruning:
+                    val = -self.negamax(next_state, -float("inf"), float("inf"), depth+1)[0]
+                elif best_move is None or not self.pvs:
+                    val = -self.negamax(next_state, -beta, -alpha, depth+1)[0]
+                else:
+                    #zero-width window: only checks whether the move is better than alpha
+                    val = -self.negamax(next_state, -math.nextafter(alpha, float("inf")), -alpha, depth+1)[0]
+                    if alpha < val < beta:
+                        val = -self.negamax(next_state, -beta, -val, depth+1)[0]
+
+                #update best value if current evaluated value from move is higher than best (the first 
+                #move is kept if every move loses, so a move is always returned)
+                if val > best_value or best_move is None:
+                    best_value = val
+                    best_move = move
+
+                alpha = max(alpha, best_value)
+
+                #if alpha >= beta, no use in continuing loop as current best move won't be subsituted
+                #by subsequent child nodes
+                if self.pruning and alpha >= beta: 
+                    break
+        finally:
+            actions.close() #undo the move left on the board if the loop was cut off
+        if self.pruning and alpha >= beta:
+            self.ordering.record_cutoff(board, depth, best_move, self.search_depth - depth)
+        self.store(board, best_value, best_move, alpha_orig, beta, depth)
 
         return best_value, best_move
 
-    def select_target(self, board):
-        """Selects best action by using the raw MiniMax algorithm.
+    def search(self, board, depth, alpha=-float("inf"), beta=float("inf")):
+        """Searches the current state to a fixed depth.
         
         Args:
             board {Board()}: board object to indicate current state of game.
+            depth {int}: depth of the search.
+            alpha {float}: lower bound of the root window.
+            beta {float}: upper bound of the root window.
 
         Returns:
-            best_move {int} : optimum action evaluated to be used to make a move in the game.
+            best_value {float}: value of the current state for the player to move.
+            best_move {int}: best action to be taken from the current state.
         """
-        if not self.is_min:
-            best_move = self.max(board)[1]
-        else:
-            best_move = self.min(board)[1]
+        self.search_depth = depth
+        return self.negamax(board, alpha, beta)
 
-        #print(best_move)
-        return best_move
+    def aspiration_search(self, board, depth, guess):
+        """Searches the current state with a window centred on a guess of its value, re-searching 
+        with the window opened on the failing side if the value falls outside of it.
 
-class AlphaBetaPlayer(Player):
-    def __init__(self, name=None, max_depth=5):
-        super().__init__(name)
-        ## Alpha is minimum value secured by Max, for herself
+        Args:
+            board {Board()}: board object to indicate current state of game.
+            depth {int}: depth of the search.
+            guess {float}: expected value (usually the value of the previous iteration).
 
-        self.max_depth = max_depth
-        self.is_min = None
-        self.first = True
-        self.alpha = None
-        self.beta = None
-        self.states_visited = 0
+        Returns:
+            best_value {float}: value of the current state for the player to move.
+            best_move {int}: best action to be taken from the current state.
+        """
+        alpha, beta = guess - self.aspiration, guess + self.aspiration
+        best_value, best_move = self.search(board, depth, alpha, beta)
+        if best_value <= alpha:
+            best_value, best_move = self.search(board, depth, -float("inf"), beta)
+        elif best_value >= beta:
+            best_value, best_move = self.search(board, depth, alpha, float("inf"))
+        return best_value, best_move
 
+    def principal_variation(self, board, best_move):
+        """Retrieves the principal variation from the current state by following the best moves 
+        stored in the transposition table (only best_move without a table).
 
-    def max(self, board, alpha, beta, depth=0):
-        """Function used to recursively retrieve heuristic from a node that corresponds to 
-        Max()'s turn by using alpha-beta pruning.
-        
         Args:
             board {Board()}: board object to indicate current state of game.
-            alpha {int}: Minimum value secured by Max()
-            beta {int}: Maximum value imposed by Min()
-            depth {int}: current depth in search tree. 
-        
-        Returns: 
-            best_value {int}: best value evaluated from child nodes. 
-            best_move {int}: best action to be taken from current node. 
-        """
-        if board.is_terminal():
-            return -float("inf"), None
-        elif depth == self.max_depth:
-            return self.heuristic(board), None
-        #elif board.game_moves == 0:
-        #    return self.heuristic(board), board.width // 2 + 1
-        
-        #initialise best value to be infinite and 
-        #negative such that any action will be chosen at first
-        best_value = -float("inf")  
-        best_move = None
+            best_move {int}: best action to be taken from the current state.
 
-        #iterate over all possible actions and retrieve best score and thus move
-        actions = board.get_actions()
-        for action in actions:
-            self.states_visited += 1
-            next_state, move = action
-            val = self.min(next_state, alpha, beta, depth+1)[0]
+        Returns:
+            pv {list}: columns of the principal variation.
+        """
+        pv = []
+        move = best_move
+        while move is not None and len(pv) < self.search_depth and board.is_valid(move) and not board.is_terminal():
+            pv.append(move)
+            board.make_move(board.get_cell(move), recursion=True)
+            move = self.probe(board, -float("inf"), float("inf"), 0)[1]
+        for _ in pv:
+            board.unmake_move()
+        return pv
+
+    def iterative_deepening(self, board):
+        """Searches the current state with increasing depths until max_depth is reached or the 
+        time or node budget runs out, reusing the principal variation of each iteration to order 
+        moves (and its value to centre the aspiration window) in the next one. The first 
+        iteration is always completed.
 
-            if val > best_value: #update best value if current evaluated value from move is lower than best
-                best_value = val
-                best_move = move
+        Args:
+            board {Board()}: board object to indicate current state of game.
 
-            alpha = max(alpha, best_value) #update beta if best value is lower than beta
+        Returns:
+            best_value {float}: value of the current state from the deepest completed iteration.
+            best_move {int}: best action from the deepest completed iteration.
+        """
+        empty_cells = board.width * board.height - board.num_moves
+        best_value, best_move = None, None
+        self.pv = []
+        self.search_stats["depth"] = 0
 
-            #if alpha >= beta, no use in continuing loop as current best move won't be subsituted
-            #by subsequent child nodes
-            if alpha >= beta: 
+        for depth in range(1, max(1, min(self.max_depth, empty_cells)) + 1):
+            self._budget_active = depth > 1
+            try:
+                if self.aspiration and self.pruning and best_value is not None:
+                    best_value, best_move = self.aspiration_search(board, depth, best_value)
+                else:
+                    best_value, best_move = self.search(board, depth)
+            except SearchTimeout:
+                break
+            finally:
+                self._budget_active = False
+            self.search_stats["depth"] = depth
+            self.search_stats["value"] = best_value
+            self.pv = self.principal_variation(board, best_move)
+
+            #no use in searching deeper once the game-theoretic value has been found
+            if abs(best_value) == float("inf"):
                 break
-
-        #print(best_value, best_move)
 
         return best_value, best_move
 
-    def min(self, board, alpha, beta, depth=0):
-        """Function used to recursively retrieve heuristic from a node that corresponds to 
-        Min()'s turn by using alpha-beta pruning.
-        
+    def solve(self, board):
+        """Selects the best action of the current state with the exact endgame solver, 
+        recording the game-theoretic result in the search statistics: "value" is inf for a 
+        win of the player to move, -inf for a loss and 0 for a draw, and "distance" is the 
+        number of moves until the game is won (None for a draw). The solver is held to the 
+        time and node budget of the move (see check_budget()).
+
         Args:
             board {Board()}: board object to indicate current state of game.
-            alpha {int}: Minimum value secured by Max()
-            beta {int}: Maximum value imposed by Min()
-            depth {int}: current depth in search tree. 
-        
-        Returns: 
-            best_value {int}: best value evaluated from child nodes. 
-            best_move {int}: best action to be taken from current node. 
-        """
-        if board.is_terminal():
-            return float("inf"), None
-        elif depth == self.max_depth:
-            return self.heuristic(board), None
-
-        #initialise best value to be infinite and positive such that any action will be chosen at first
-        best_value = float("inf")
-        best_move = None
-
-        #iterate over all possible actions and retrieve best score (and thus corresponding move)
-        actions = board.get_actions()
-        for action in actions:
-            self.states_visited += 1
-            next_state, move = action
-            #child_state.print()
-            val = self.max(next_state, alpha, beta, depth+1)[0]
 
-            if val < best_value:
-                best_value = val
-                best_move = move
-
-            beta = min(beta, best_value) #update beta if best value is lower than beta
+        Returns:
+            best_move {int}: fastest winning (or slowest losing) action.
 
-            #if alpha >= beta, no use in continuing loop as current best move won't be subsituted
-            #by subsequent child nodes
-            if alpha >= beta: 
-                break
-        
-        #print(best_value, best_move)
+        Raises:
+            SearchTimeout if the budget runs out before the position is solved.
+        """
+        if self.solver is None:
+            self.solver = Solver()
+        self.solver.nodes = 0
+        self.solver.budget = self._solver_budget if self._deadline is not None or self.node_limit is not None else None
+        try:
+            best_move, score = self.solver.best_move(board)
+        finally:
+            self.solver.budget = None
+        result, distance = self.solver.result(board, score)
+        self.states_visited = self.solver.nodes
+        self.pv = []
+        self.search_stats["solved"] = True
+        self.search_stats["depth"] = board.width * board.height - board.num_moves
+        self.search_stats["value"] = result * float("inf") if result else 0.0
+        self.search_stats["distance"] = distance
+        return best_move
 
-        return best_value, best_move
+    def _solver_budget(self):
+        """Checks the budget of the move with the nodes visited by the solver."""
+        self.states_visited = self.solver.nodes
+        self.check_budget()
 
     def select_target(self, board):
-        """Selects best action by using alpha-beta pruning with the MiniMax algorithm.
+        """Selects best action for the player to move by searching the current state (or by 
+        looking it up in the opening book, or by solving it exactly once at most 
+        solver_threshold cells are empty). When pondering, the background search is stopped 
+        first and its move is played at once if it had already searched the current state to 
+        max_depth, and a new background search is started once the move has been selected.
         
         Args:
             board {Board()}: board object to indicate current state of game.
 
         Returns:
             best_move {int} : optimum action evaluated to be used to make a move in the game.
+
+        Raises:
+            ValueError if the player was loaded from a snapshot of another board size or k 
+            (see check_snapshot()).
         """
-        self.states_visited = 0
+        if self.profiler is not None and not self.profiler.active:
+            return self.profiler.profile(self, board)
+        self.check_snapshot(board)
+        start = time.perf_counter()
+        self.stop_pondering()
+        pondered = self._ponder_results.get(board.hash)
+        self._ponder_results = {}
 
-        if not self.is_min:
-            best_move = self.max(board, alpha = -float("inf"), beta = float("inf"))[1]
+        self.states_visited = 0
+        self.search_stats = {}
+        self._root_moves = board.num_moves
+        self.ordering.new_search()
+        if self.table is not None:
+            self.table.reset_stats()
+
+        entry = self.book.lookup(board) if self.book is not None else None
+        empty_cells = board.width * board.height - board.num_moves
+        if pondered is not None and pondered[2] >= self.max_depth and board.is_valid(pondered[0]):
+            #the opponent played the reply pondered, which has already been searched to max_depth
+            best_move = pondered[0]
+            self.pv = []
+            self.search_stats["ponder_hit"] = True
+            self.search_stats["depth"] = pondered[2]
+            self.search_stats["value"] = pondered[1]
+        elif entry is not None and board.is_valid(entry[0]):
+            best_move = entry[0]
+            self.pv = []
+            self.search_stats["book"] = True
+            self.search_stats["depth"] = self.book.depth
+            self.search_stats["value"] = entry[1]
+        elif self.solver_threshold is not None and empty_cells <= self.solver_threshold and not board.is_terminal():
+            self._deadline = start + self.time_limit if self.time_limit is not None else None
+            try:
+                best_move = self.solve(board)
+            except SearchTimeout:
+                #positions of larger boards may not be solved within the budget, the search 
+                #completes at least its first iteration
+                self.search_stats["solver_timeout"] = True
+                best_move = self.iterative_deepening(board)[1]
+            finally:
+                self._deadline = None
+        elif self.time_limit is None and self.node_limit is None and not self.aspiration:
+            self.pv = []
+            best_value, best_move = self.search(board, self.max_depth)
+            self.search_stats["depth"] = self.max_depth
+            self.search_stats["value"] = best_value
         else:
-            best_move = self.min(board, alpha = -float("inf"), beta = float("inf"))[1]
-
-        print(best_move)
+            self._deadline = start + self.time_limit if self.time_limit is not None else None
+            best_move = self.iterative_deepening(board)[1]
+            self._deadline = None
+
+        self.search_stats.setdefault("ponder_hit", False)
+        self.search_stats.setdefault("book", False)
+        self.search_stats.setdefault("solved", False)
+        self.search_stats["states_visited"] = self.states_visited
+        self.search_stats["time"] = time.perf_counter() - start
+        if self.table is not None:
+            self.search_stats.update(self.table.stats())
+        if self.eval_cache is not None:
+            self.search_stats["eval_cache"] = self.eval_cache.stats()
+
+        if self.verbose:
+            print(best_move)
+        if self.ponder is not None and best_move is not None:
+            self.start_pondering(board, best_move)
         return best_move
 
+
+class MiniMaxPlayer(SearchPlayer):
+    def __init__(self, max_depth=5, name=None):
+        """ Initialises a player using the raw MiniMax algorithm (every node is expanded, from 
+        left to right, without transposition table nor threat pruning).
+
+        Args:
+            max_depth {int}: maximum depth allowed in searching for optimum action.
+            name (str): Player's name
+        """
+        super().__init__(name, max_depth, pruning=False, pvs=False, tt_entries=0,
+                         ordering=MoveOrdering(center=False, killers=False, history=False, hash_move=False),
+                         verbose=False, threats=False)
+
+
+class AlphaBetaPlayer(SearchPlayer):
+    def __init__(self, name=None, max_depth=5, tt_entries=2**20, tt_replacement="depth",
+                 time_limit=None, node_limit=None, ordering=None, verbose=True, pvs=True, 
+                 aspiration=None, solver_threshold=14, book=None, threats=True, eval_cache=None,
+                 batch_frontier=False, ponder=None, snapshot=None, profiler=None):
+        """ Initialises a player using alpha-beta pruning with principal variation search, 
+        a transposition table and move ordering, playing the moves of the opening book if one 
+        is given and switching to the exact endgame solver once at most solver_threshold 
+        cells are empty (see SearchPlayer for the arguments). 
+        
+        The default threshold keeps solving 7x6 positions well under a second (a few 
+        milliseconds on average). Larger boards may take much longer to solve, so with a time 
+        or node budget the solver is stopped when the budget runs out and the move is searched 
+        by iterative deepening instead.
+        """
+        super().__init__(name, max_depth, pruning=True, pvs=pvs, aspiration=aspiration,
+                         tt_entries=tt_entries, tt_replacement=tt_replacement, time_limit=time_limit,
+                         node_limit=node_limit, ordering=ordering, verbose=verbose, 
+                         solver_threshold=solver_threshold, book=book, threats=threats,
+                         eval_cache=eval_cache, batch_frontier=batch_frontier, ponder=ponder,
+                         snapshot=snapshot, profiler=profiler)
+
 class ManualPlayer(Player):
     """ A player playing manually via the terminal
     """
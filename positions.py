@@ -0,0 +1,40 @@
+""" Standard positions used to measure the search.
+
+Each position is described by the columns played from the empty board, one digit per move
+(see Board.from_moves()), together with the size of the board and the k needed to win.
+"""
+
+STANDARD_POSITIONS = [
+    {"name": "empty", "phase": "opening", "size": (7, 6), "k": 4, "moves": ""},
+    {"name": "edge-reply", "phase": "opening", "size": (7, 6), "k": 4, "moves": "7"},
+    {"name": "opening-2", "phase": "opening", "size": (7, 6), "k": 4, "moves": "47"},
+    {"name": "opening-3", "phase": "opening", "size": (7, 6), "k": 4, "moves": "653"},
+    {"name": "opening-4", "phase": "opening", "size": (7, 6), "k": 4, "moves": "2614"},
+    {"name": "opening-6", "phase": "opening", "size": (7, 6), "k": 4, "moves": "451333"},
+    {"name": "midgame-8", "phase": "midgame", "size": (7, 6), "k": 4, "moves": "41227161"},
+    {"name": "midgame-10", "phase": "midgame", "size": (7, 6), "k": 4, "moves": "1256467353"},
+    {"name": "midgame-12", "phase": "midgame", "size": (7, 6), "k": 4, "moves": "637461224441"},
+    {"name": "midgame-14", "phase": "midgame", "size": (7, 6), "k": 4, "moves": "65244323115722"},
+    {"name": "midgame-16", "phase": "midgame", "size": (7, 6), "k": 4, "moves": "6731311254625264"},
+    {"name": "midgame-20", "phase": "midgame", "size": (7, 6), "k": 4, "moves": "76431314533611514351"},
+    {"name": "endgame-30", "phase": "endgame", "size": (7, 6), "k": 4, "moves": "371774366457551763173341435211"},
+    {"name": "endgame-34", "phase": "endgame", "size": (7, 6), "k": 4, "moves": "4521236457615227533744737632126761"},
+    {"name": "endgame-36", "phase": "endgame", "size": (7, 6), "k": 4, "moves": "672334757511467764665642237341353514"},
+    {"name": "6x5-empty", "phase": "opening", "size": (6, 5), "k": 4, "moves": ""},
+    {"name": "6x5-midgame-8", "phase": "midgame", "size": (6, 5), "k": 4, "moves": "45545515"},
+    {"name": "6x5-endgame-20", "phase": "endgame", "size": (6, 5), "k": 4, "moves": "54462125113346535546"},
+    {"name": "5x4-k3-opening-2", "phase": "opening", "size": (5, 4), "k": 3, "moves": "31"},
+    {"name": "5x4-k3-midgame-6", "phase": "midgame", "size": (5, 4), "k": 3, "moves": "133325"},
+    {"name": "8x7-k5-empty", "phase": "opening", "size": (8, 7), "k": 5, "moves": ""},
+    {"name": "8x7-k5-midgame-10", "phase": "midgame", "size": (8, 7), "k": 5, "moves": "7361563855"},
+    {"name": "8x7-k5-endgame-30", "phase": "endgame", "size": (8, 7), "k": 5, "moves": "285153141678227122672744176483"},
+    {"name": "9x7-opening-6", "phase": "opening", "size": (9, 7), "k": 4, "moves": "281597"},
+]
+
+
+def get_positions(phase=None, size=None, k=None):
+    """Retrieves the standard positions matching a phase, board size and k (None matches all)."""
+    return [position for position in STANDARD_POSITIONS
+            if (phase is None or position["phase"] == phase)
+            and (size is None or position["size"] == tuple(size))
+            and (k is None or position["k"] == k)]
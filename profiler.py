@@ -0,0 +1,273 @@
+import argparse
+import cProfile
+import io
+import json
+import pstats
+import time
+
+from board import Board
+
+#methods measured in every phase of the search, on the player, its evaluation cache and the board searched
+PHASES = {
+    "move_generation": {"player": ("order_moves",), "board": ("get_cell",)},
+    "make_unmake": {"board": ("make_move", "unmake_move")},
+    "terminal_checks": {"board": ("is_full", "is_terminal", "winner_check")},
+    "leaf_evaluation": {"player": ("heuristic", "heuristic_batch")},
+    "cache_lookups": {"player": ("probe", "store"), "eval_cache": ("get", "put")},
+}
+
+
+def effective_branching_factor(iterations):
+    """Retrieves the effective branching factor of an iterative deepening search: the ratio of
+    the nodes of its last two iterations (or nodes**(1/depth) after a single iteration).
+
+    Args:
+        iterations {list}: {"depth", "nodes"} of every completed iteration, in order.
+
+    Returns:
+        {float}: effective branching factor (None if no iteration was completed).
+    """
+    if not iterations or iterations[-1]["depth"] == 0:
+        return None
+    if len(iterations) > 1 and iterations[-2]["nodes"]:
+        return iterations[-1]["nodes"] / iterations[-2]["nodes"]
+    return iterations[-1]["nodes"] ** (1 / iterations[-1]["depth"])
+
+
+class SearchProfiler():
+    """ Profiler of the searches of a SearchPlayer.
+
+    A player given a profiler (see SearchPlayer) hands every select_target() call over to
+    profile(), which measures that single call and appends its report to reports. Nothing is
+    measured, nor any check made in the search, by players without a profiler.
+
+    Modes:
+        - "phases": the methods of each phase of the search (see PHASES) are wrapped for the
+          duration of the call, on the player and its evaluation cache (as instance attributes)
+          and on the board searched (whose class is switched to a subclass), measuring their
+          calls and exclusive time. negamax() and search() are wrapped too, counting the nodes
+          of every depth and iteration and the beta cutoffs (and whether they happened on the
+          first move searched). Wins are detected incrementally by make_move(), so their cost
+          is part of "make_unmake" rather than "terminal_checks". Wrappers add their own
+          overhead (roughly a microsecond per call), which inflates the phases measured.
+        - "cprofile": the call is run under cProfile, the statistics of every call are
+          accumulated in stats (see dump_stats()) and reports list the functions with the
+          largest cumulative time.
+    """
+    modes = ("phases", "cprofile")
+
+    def __init__(self, mode="phases", top=20):
+        """ Initialises a profiler.
+
+        Args:
+            mode (str): "phases" or "cprofile". Defaults to "phases".
+            top (int): number of functions listed by the reports of the "cprofile" mode.
+
+        Raises:
+            ValueError if the mode is unknown.
+        """
+        if mode not in self.modes:
+            raise ValueError(f"Unknown profiler mode {mode!r}, expected one of {self.modes}.")
+        self.mode = mode
+        self.top = top
+        self.active = False
+        self.reports = [] #report of every profiled select_target() call
+        self.stats = None #pstats.Stats() accumulated by the "cprofile" mode
+        self._board_classes = {}
+
+    def profile(self, player, board):
+        """Selects the move of a player while measuring its search (the player is left as it
+        was, apart from the report stored in its search_stats under "profile").
+
+        Args:
+            player {SearchPlayer()}: player selecting the move.
+            board {Board()}: board object to indicate current state of game.
+
+        Returns:
+            best_move {int}: move selected by the player.
+        """
+        #the background search of the player must not be measured (nor copy the wrappers)
+        player.stop_pondering()
+        ponder, player.ponder = player.ponder, None
+        self.active = True
+        start = time.perf_counter()
+        try:
+            if self.mode == "cprofile":
+                best_move, report = self._run_cprofile(player, board)
+            else:
+                best_move, report = self._run_phases(player, board)
+        finally:
+            self.active = False
+            player.ponder = ponder
+
+        report.update({"move": best_move, "time": time.perf_counter() - start, "depth": player.search_stats.get("depth"),
+                       "states_visited": player.search_stats.get("states_visited")})
+        self.reports.append(report)
+        player.search_stats["profile"] = report
+        if ponder is not None and best_move is not None:
+            player.start_pondering(board, best_move)
+        return best_move
+
+    def _run_cprofile(self, player, board):
+        """Selects the move of a player under cProfile (see profile())."""
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            best_move = player.select_target(board)
+        finally:
+            profile.disable()
+        if self.stats is None:
+            self.stats = pstats.Stats(profile, stream=io.StringIO())
+        else:
+            self.stats.add(profile)
+
+        functions = []
+        stats = pstats.Stats(profile, stream=io.StringIO()).stats
+        for (filename, line, name), (_, calls, total_time, cumulative_time, _) in stats.items():
+            functions.append({"function": f"{filename}:{line}({name})", "calls": calls,
+                              "total_time": total_time, "cumulative_time": cumulative_time})
+        functions.sort(key=lambda function: function["cumulative_time"], reverse=True)
+        return best_move, {"mode": "cprofile", "functions": functions[:self.top]}
+
+    def _board_class(self, cls, timed):
+        """Retrieves the subclass of a board class whose methods of PHASES are timed."""
+        if cls not in self._board_classes:
+            methods = {"__slots__": ()}
+            for phase, targets in PHASES.items():
+                for name in targets.get("board", ()):
+                    methods[name] = timed(phase, getattr(cls, name))
+            self._board_classes[cls] = type(f"Profiled{cls.__name__}", (cls,), methods)
+        return self._board_classes[cls]
+
+    def _run_phases(self, player, board):
+        """Selects the move of a player with the methods of every phase wrapped (see profile())."""
+        calls = {phase: 0 for phase in PHASES}
+        times = {phase: 0.0 for phase in PHASES}
+        children = [] #time spent in the timed calls nested in each timed call being run
+        timer = time.perf_counter
+
+        def timed(phase, function):
+            def wrapper(*args, **kwargs):
+                children.append(0.0)
+                start = timer()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    elapsed = timer() - start
+                    times[phase] += elapsed - children.pop()
+                    calls[phase] += 1
+                    if children:
+                        children[-1] += elapsed
+            return wrapper
+
+        nodes = [] #negamax() calls of every depth
+        frames = [] #children searched by each negamax() call being run
+        counts = {"interior_nodes": 0, "cutoffs": 0, "first_move_cutoffs": 0}
+        iterations = []
+
+        def negamax(function):
+            def wrapper(board, alpha, beta, depth=0):
+                while len(nodes) <= depth:
+                    nodes.append(0)
+                nodes[depth] += 1
+                if frames:
+                    frames[-1] += 1
+                frames.append(0)
+                try:
+                    value, move = function(board, alpha, beta, depth)
+                finally:
+                    searched = frames.pop()
+                if searched:
+                    counts["interior_nodes"] += 1
+                    if player.pruning and value >= beta:
+                        counts["cutoffs"] += 1
+                        counts["first_move_cutoffs"] += searched == 1
+                return value, move
+            return wrapper
+
+        def search(function):
+            def wrapper(board, depth, *args, **kwargs):
+                start, before = timer(), sum(nodes)
+                result = function(board, depth, *args, **kwargs)
+                iterations.append({"depth": depth, "nodes": sum(nodes) - before, "time": timer() - start})
+                return result
+            return wrapper
+
+        wrapped = {"negamax": negamax(player.negamax), "search": search(player.search)}
+        cache = player.eval_cache
+        cache_wrapped = {}
+        for phase, targets in PHASES.items():
+            for name in targets.get("player", ()):
+                wrapped[name] = timed(phase, getattr(player, name))
+            if cache is not None:
+                for name in targets.get("eval_cache", ()):
+                    cache_wrapped[name] = timed(phase, getattr(cache, name))
+
+        board_class = board.__class__
+        player.__dict__.update(wrapped)
+        if cache is not None:
+            cache.__dict__.update(cache_wrapped)
+        board.__class__ = self._board_class(board_class, timed)
+        start = timer()
+        try:
+            best_move = player.select_target(board)
+        finally:
+            elapsed = timer() - start
+            board.__class__ = board_class
+            for name in wrapped:
+                del player.__dict__[name]
+            if cache is not None:
+                for name in cache_wrapped:
+                    del cache.__dict__[name]
+
+        phases = {phase: {"calls": calls[phase], "time": times[phase], "share": times[phase] / elapsed if elapsed else None}
+                  for phase in PHASES}
+        other = elapsed - sum(times.values())
+        phases["other"] = {"calls": None, "time": other, "share": other / elapsed if elapsed else None}
+        counts["first_move_cutoff_rate"] = counts["first_move_cutoffs"] / counts["cutoffs"] if counts["cutoffs"] else None
+        return best_move, {
+            "mode": "phases",
+            "phases": phases,
+            "nodes_per_depth": nodes,
+            "cutoffs": counts,
+            "iterations": iterations,
+            "effective_branching_factor": effective_branching_factor(iterations),
+        }
+
+    def write(self, path):
+        """Writes the reports of every profiled call to a JSON file."""
+        with open(path, "w") as report_file:
+            json.dump(self.reports, report_file, indent=2)
+
+    def dump_stats(self, path):
+        """Writes the cProfile statistics accumulated by the "cprofile" mode to a file readable
+        by pstats.Stats()."""
+        if self.stats is None:
+            raise ValueError("No cProfile statistics have been collected.")
+        self.stats.dump_stats(path)
+
+
+if __name__ == '__main__':
+    from player import AlphaBetaPlayer
+
+    parser = argparse.ArgumentParser(description="Profiles the search of an AlphaBetaPlayer from a position.")
+    parser.add_argument("--moves", default="", help="moves played from the empty board (see Board.from_moves())")
+    parser.add_argument("--size", type=int, nargs=2, default=(7, 6), help="width and height of the board")
+    parser.add_argument("--k", type=int, default=4, help="number of connected pieces needed to win")
+    parser.add_argument("--depth", type=int, default=7, help="search depth")
+    parser.add_argument("--time-limit", type=float, default=None, help="time budget of the search (iterative deepening)")
+    parser.add_argument("--mode", choices=SearchProfiler.modes, default="phases", help="profiler mode")
+    parser.add_argument("--output", default=None, help="JSON file to write the report to (stdout by default)")
+    parser.add_argument("--pstats", default=None, help="file to dump the cProfile statistics to (cprofile mode)")
+    args = parser.parse_args()
+
+    profiler = SearchProfiler(args.mode)
+    player = AlphaBetaPlayer(max_depth=args.depth, time_limit=args.time_limit, verbose=False, solver_threshold=None,
+                             profiler=profiler)
+    player.select_target(Board.from_moves(args.moves, tuple(args.size), args.k))
+    if args.output is not None:
+        profiler.write(args.output)
+    else:
+        print(json.dumps(profiler.reports[-1], indent=2))
+    if args.pstats is not None:
+        profiler.dump_stats(args.pstats)
@@ -0,0 +1,218 @@
+import argparse
+import json
+import math
+import struct
+import time
+
+import numpy as np
+
+from board import Board
+
+MAGIC = b"C4REC"
+VERSION = 1
+#magic, version, width, height, k, number of games and number of moves of a batch (20 bytes)
+HEADER = struct.Struct("<5sBBBB3xII")
+#per-move metrics (see Game.move_record()) with their storage type and the value standing for None
+METRICS = (("wall_time", "<f4", math.nan), ("cpu_time", "<f4", math.nan), ("states_visited", "<u4", 2**32 - 1),
+           ("depth", "u1", 255), ("tt_hit_rate", "<f4", math.nan))
+
+
+class RecordWriter():
+    """ Appends game records to a compact binary file.
+
+    Games are buffered and written in batches, each a header followed by columns: the number of
+    moves, number of opening moves and winner of every game (5 bytes per game), the column of
+    every move (1 byte per move) and the metrics of every move chosen by a player (17 bytes per
+    move, see METRICS). Batches are only ever appended, each with a single write, so a file
+    interrupted while writing keeps every batch written before, and a file can hold games of
+    several board sizes.
+    """
+    def __init__(self, path, size, k, batch_size=1024):
+        """ Opens a record file for appending (it is created if it does not exist).
+
+        Args:
+            path {str}: file to append to.
+            size (tuple[int, int]): (width, height) of the board of the games.
+            k {int}: number of connected positions needed to win a game.
+            batch_size {int}: number of games buffered before a batch is written.
+        """
+        self.path = path
+        self.size = tuple(size)
+        self.k = k
+        self.batch_size = batch_size
+        self.file = open(path, "ab")
+        self.games = 0
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, moves, winner, opening=0, metrics=None):
+        """Adds the record of a game (written with the next batch).
+
+        Args:
+            moves {list}: columns played from the empty board (1-indexed, see 
+                          Board.from_moves()), including the opening. Move strings are only 
+                          accepted for boards up to 9 columns wide.
+            winner {int}: 1 if the starting player won, 2 if the other player won, 0 for a draw
+                          (see Game.play()).
+            opening {int}: number of moves of the opening, which have no metrics.
+            metrics {list}: record of every move played after the opening (see
+                            Game.move_record(), missing metrics are stored as None), None if
+                            no metrics were recorded.
+
+        Raises:
+            ValueError if there is not one record per move played after the opening, or moves
+            is a move string for a board wider than 9 columns.
+        """
+        if isinstance(moves, str) and self.size[0] > 9:
+            raise ValueError(f"Move strings can not describe {self.size[0]} columns, expected a list of columns.")
+        columns = [int(move) for move in moves]
+        if metrics is not None and len(metrics) != len(columns) - opening:
+            raise ValueError(f"Expected {len(columns) - opening} move records, got {len(metrics)}.")
+        self._pending.append((columns, winner, opening, metrics))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the games added since the last batch as a new batch."""
+        if not self._pending:
+            return
+        lengths = np.array([len(game[0]) for game in self._pending], dtype="<u2")
+        openings = np.array([game[2] for game in self._pending], dtype="<u2")
+        winners = np.array([game[1] for game in self._pending], dtype=np.uint8)
+        columns = np.array([col for game in self._pending for col in game[0]], dtype=np.uint8)
+
+        parts = [HEADER.pack(MAGIC, VERSION, self.size[0], self.size[1], self.k, len(self._pending), len(columns)),
+                 lengths.tobytes(), openings.tobytes(), winners.tobytes(), columns.tobytes()]
+        records = [record for columns, _, opening, metrics in self._pending
+                   for record in (metrics if metrics is not None else [{}] * (len(columns) - opening))]
+        for name, dtype, missing in METRICS:
+            values = [record.get(name) for record in records]
+            parts.append(np.array([missing if value is None else value for value in values], dtype=dtype).tobytes())
+
+        self.file.write(b"".join(parts))
+        self.file.flush()
+        self.games += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        """Writes the pending games and closes the file."""
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+def read_records(path):
+    """Iterates over the games of a record file (see RecordWriter), reading a single batch at a
+    time, so memory does not grow with the size of the file.
+
+    Args:
+        path {str}: file written by a RecordWriter.
+
+    Yields:
+        record {dict}: board "size" and "k", "moves" (columns played, including the opening),
+                       number of "opening" moves, "winner" and "metrics" of every move played
+                       after the opening (dicts of METRICS, None for missing values).
+
+    Raises:
+        ValueError if the file is not a record file of a supported version.
+    """
+    with open(path, "rb") as record_file:
+        while True:
+            header = record_file.read(HEADER.size)
+            if not header:
+                return
+            if len(header) < HEADER.size:
+                raise ValueError(f"{path!r} ends with a truncated batch.")
+            magic, version, width, height, k, num_games, num_moves = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path!r} is not a game record file of version {VERSION}.")
+
+            games = np.frombuffer(record_file.read(5 * num_games), dtype=np.uint8)
+            lengths = games[:2*num_games].view("<u2").tolist()
+            openings = games[2*num_games:4*num_games].view("<u2").tolist()
+            winners = games[4*num_games:].tolist()
+            columns = list(record_file.read(num_moves))
+            num_metrics = num_moves - sum(openings)
+            metrics = []
+            for name, dtype, missing in METRICS:
+                itemsize = np.dtype(dtype).itemsize
+                values = np.frombuffer(record_file.read(itemsize * num_metrics), dtype=dtype).tolist()
+                if isinstance(missing, float):
+                    metrics.append([None if value != value else value for value in values])
+                else:
+                    metrics.append([None if value == missing else value for value in values])
+            if len(columns) < num_moves or len(metrics[-1]) < num_metrics:
+                raise ValueError(f"{path!r} ends with a truncated batch.")
+
+            names = [name for name, _, _ in METRICS]
+            move_start = metric_start = 0
+            for length, opening, winner in zip(lengths, openings, winners):
+                played = length - opening
+                yield {
+                    "size": (width, height),
+                    "k": k,
+                    "moves": columns[move_start:move_start + length],
+                    "opening": opening,
+                    "winner": winner,
+                    "metrics": [dict(zip(names, values)) for values in
+                                zip(*(column[metric_start:metric_start + played] for column in metrics))],
+                }
+                move_start += length
+                metric_start += played
+
+
+def replay(path):
+    """Replays the games of a record file through a Board, one position at a time.
+
+    Args:
+        path {str}: file written by a RecordWriter.
+
+    Yields:
+        record {dict}: record of the game (see read_records()).
+        ply {int}: index of the next move in record["moves"] (only moves played after the
+                   opening are yielded).
+        board {Board()}: position before the move. The board is updated in place as the game
+                         is replayed, so it must be copied to be kept.
+    """
+    for record in read_records(path):
+        board = Board(record["size"], record["k"])
+        for ply, col in enumerate(record["moves"]):
+            if ply >= record["opening"]:
+                yield record, ply, board
+            board.make_move(board.get_cell(col))
+
+
+if __name__ == '__main__':
+    from tournament import make_player
+
+    parser = argparse.ArgumentParser(description="Summarises or re-analyses a game record file.")
+    parser.add_argument("records", help="file written by a RecordWriter")
+    parser.add_argument("--rescore", default=None, help="JSON configuration of an engine (see tournament.make_player()) "
+                                                         "searching every position, reporting how often it agrees with "
+                                                         "the move played")
+    parser.add_argument("--limit", type=int, default=None, help="maximum number of positions re-analysed")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.rescore is None:
+        summary = {"games": 0, "moves": 0, "first_wins": 0, "second_wins": 0, "draws": 0}
+        for record in read_records(args.records):
+            summary["games"] += 1
+            summary["moves"] += len(record["moves"])
+            summary[("draws", "first_wins", "second_wins")[record["winner"]]] += 1
+    else:
+        engine = make_player(json.loads(args.rescore))
+        summary = {"positions": 0, "agreements": 0}
+        for record, ply, board in replay(args.records):
+            if args.limit is not None and summary["positions"] >= args.limit:
+                break
+            summary["positions"] += 1
+            summary["agreements"] += engine.select_target(board) == record["moves"][ply]
+        summary["agreement_rate"] = summary["agreements"] / summary["positions"] if summary["positions"] else None
+    summary["time"] = time.perf_counter() - start
+    print(json.dumps(summary))
@@ -0,0 +1,537 @@
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+
+from board import Board
+from tournament import make_player
+from transposition import TranspositionTable
+
+DEFAULT_ENGINE = {"type": "alphabeta", "max_depth": 6}
+MAX_DEPTH = 12 #deepest search a client may ask for
+MAX_TT_ENTRIES = 2**22 #largest transposition table a client may ask for
+
+
+def _is_int(value, low, high):
+    return isinstance(value, int) and not isinstance(value, bool) and low <= value <= high
+
+
+def _is_positive(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+
+#options of the engines clients may configure, with the check of their values (options giving
+#access to the files of the server, such as "book" or "snapshot", can only be set in its engine)
+CLIENT_ENGINE_OPTIONS = {
+    "type": lambda value: value in ("alphabeta", "minimax"),
+    "max_depth": lambda value: _is_int(value, 1, MAX_DEPTH),
+    "tt_entries": lambda value: _is_int(value, 0, MAX_TT_ENTRIES),
+    "tt_replacement": lambda value: value in TranspositionTable.policies,
+    "time_limit": lambda value: value is None or _is_positive(value),
+    "node_limit": lambda value: value is None or _is_int(value, 1, 2**40),
+    "pvs": lambda value: isinstance(value, bool),
+    "aspiration": lambda value: value is None or _is_positive(value),
+    "solver_threshold": lambda value: value is None or _is_int(value, 0, 14),
+    "threats": lambda value: isinstance(value, bool),
+    "batch_frontier": lambda value: isinstance(value, bool),
+}
+#options of the minimax engine (see tournament.make_player() and MiniMaxPlayer)
+MINIMAX_OPTIONS = ("type", "max_depth")
+
+
+def client_engine(engine, default):
+    """Builds the engine configuration of a session from the options sent by a client.
+
+    Args:
+        engine {dict}: options of the client (see CLIENT_ENGINE_OPTIONS), None for the engine
+                       of the server.
+        default {dict}: engine of the server, whose options (including the server-side ones)
+                        are kept unless the client overrides them or changes the engine type.
+
+    Returns:
+        {dict}: engine configuration (see tournament.make_player()).
+
+    Raises:
+        ServerError if an option is unknown, not allowed for clients or out of bounds.
+    """
+    if engine is None:
+        return dict(default)
+    if not isinstance(engine, dict):
+        raise ServerError("The engine must be a JSON object.")
+    for name, value in engine.items():
+        if name not in CLIENT_ENGINE_OPTIONS:
+            raise ServerError(f"Engine option {name!r} can not be set by clients, expected some of "
+                              f"{sorted(CLIENT_ENGINE_OPTIONS)}.")
+        if not CLIENT_ENGINE_OPTIONS[name](value):
+            raise ServerError(f"Invalid value {value!r} of engine option {name!r}.")
+    kind = engine.get("type", default.get("type", "alphabeta"))
+    if kind == "minimax":
+        options = [name for name in engine if name not in MINIMAX_OPTIONS]
+        if options:
+            raise ServerError(f"Engine options {options} are not supported by the minimax engine.")
+        return {"type": "minimax", "max_depth": engine.get("max_depth", default.get("max_depth", 5))}
+    if default.get("type", "alphabeta") != kind:
+        return dict(engine)
+    return dict(default, **engine)
+
+_worker_players = {} #search player of each engine configuration, kept between the requests of a worker
+
+
+def _select_move(moves, size, k, config, time_limit):
+    """Selects the move of the engine in a worker process.
+
+    Args:
+        moves {list}: columns played from the empty board (see Board.from_moves()).
+        size (tuple[int, int]): (width, height) of the board.
+        k {int}: number of connected positions needed to win a game.
+        config {dict}: engine configuration (see tournament.make_player()).
+        time_limit {float}: time left before the deadline of the request in seconds (None for
+                            no deadline), used as the time budget of the search.
+
+    Returns:
+        column {int}: column selected.
+        stats {dict}: depth, value, states visited and time of the search.
+    """
+    key = json.dumps(config, sort_keys=True)
+    if key not in _worker_players:
+        _worker_players[key] = make_player(config)
+    player = _worker_players[key]
+
+    player.time_limit = time_limit if time_limit is not None else config.get("time_limit")
+    board = Board.from_moves(moves, size, k)
+    column = player.select_target(board)
+    stats = {name: player.search_stats.get(name) for name in ("depth", "value", "states_visited", "time")}
+    if stats["value"] is not None and abs(stats["value"]) == float("inf"):
+        stats["value"] = "inf" if stats["value"] > 0 else "-inf" #keeps responses valid JSON
+    return column, stats
+
+
+def _warm_up(workers):
+    """Waits a little in a worker process so that the pool starts all of its processes."""
+    time.sleep(0.01 * workers)
+
+
+class ServerError(Exception):
+    """Raised when a request can not be served (unknown session, invalid move, deadline...)."""
+
+
+class GameSession():
+    """ Game between a client and an engine hosted by a GameServer.
+
+    The client and the engine take turns as in Game: the client plays its moves through
+    GameServer.play() and the engine replies through the worker pool.
+    """
+    def __init__(self, session_id, owner, size, k, engine, engine_first):
+        """ Initialises a session.
+
+        Args:
+            session_id {int}: identifier of the session.
+            owner {str}: client owning the session (requests are queued fairly between owners).
+            size (tuple[int, int]): (width, height) of the board.
+            k {int}: number of connected positions needed to win a game.
+            engine {dict}: engine configuration (see tournament.make_player()).
+            engine_first {bool}: If True the engine plays the first move.
+        """
+        self.session_id = session_id
+        self.owner = owner
+        self.board = Board(size, k)
+        self.engine = engine
+        self.engine_player = 1 if engine_first else 2
+        self.moves = [] #columns played so far
+        self.records = [] #per-move records of the engine (column, latency, queue time, search stats)
+        self.busy = False #True while the engine is selecting a move
+
+    def state(self):
+        """Returns the public state of the session as a dictionary."""
+        return {"session": self.session_id, "moves": list(self.moves), "winner": self.board.winner,
+                "finished": self.board.is_terminal()}
+
+    def apply(self, column):
+        """Plays a column on the board of the session.
+
+        Raises:
+            ServerError if the column is not a valid move or the game is over."""
+        if self.board.is_terminal():
+            raise ServerError("The game is over.")
+        if isinstance(column, bool) or not isinstance(column, int) or not self.board.is_valid(column):
+            raise ServerError(f"Invalid move {column!r}.")
+        self.board.make_move(self.board.get_cell(column))
+        self.moves.append(column)
+
+
+class GameServer():
+    """ Hosts many concurrent games against engines searching in a bounded pool of processes.
+
+    Engine searches are queued per owner (the client that created the session) and owners are
+    served in turn, so a client with many sessions (or many pending requests) can not starve
+    the others. Every request may carry a deadline: the search gets the time left as its time
+    budget (see SearchPlayer time_limit), and requests still queued at their deadline fail
+    instead of occupying a worker. At most `workers` searches run at the same time.
+
+    The server can be used in-process (new_game(), play(), close_game(), handle()) or over a
+    local socket with one JSON request per line (see serve()).
+    """
+    def __init__(self, workers=None, engine=None, margin=0.25):
+        """ Initialises a server (the worker processes are started by start()).
+
+        Args:
+            workers {int}: number of worker processes (defaults to the number of CPUs).
+            engine {dict}: default engine configuration (defaults to DEFAULT_ENGINE).
+            margin {float}: time in seconds kept from the deadline of a request for the
+                            communication with the worker and the overshoot of the search
+                            (larger when workers share CPUs).
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.engine = dict(engine) if engine is not None else dict(DEFAULT_ENGINE)
+        self.margin = margin
+        self.sessions = {}
+        self.executor = None
+        self._ids = itertools.count(1)
+        self._queues = OrderedDict() #deque of pending jobs of every owner, served in turn
+        self._free_workers = 0
+        self._dispatcher = None
+        self._wakeup = None
+        self.stats = {"requests": 0, "completed": 0, "expired": 0, "failed": 0}
+
+    async def start(self):
+        """Starts the worker processes (waiting until they are ready, so that the first requests
+        do not pay for their start-up) and the dispatcher."""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers)
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(self.executor, _warm_up, self.workers)
+                                   for _ in range(self.workers)))
+            self._free_workers = self.workers
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def close(self):
+        """Fails the pending requests and shuts the worker processes down."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        for queue in self._queues.values():
+            for job in queue:
+                if not job["future"].done():
+                    job["future"].set_exception(ServerError("The server is closing."))
+        self._queues.clear()
+        if self.executor is not None:
+            executor, self.executor = self.executor, None
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def new_game(self, size=(7, 6), k=4, engine=None, engine_first=False, owner=None, deadline=None):
+        """Creates a session (the engine plays its first move if it starts).
+
+        Args:
+            size (tuple[int, int]): (width, height) of the board.
+            k {int}: number of connected positions needed to win a game.
+            engine {dict}: engine options of the client (see client_engine(), defaults to the 
+                           engine of the server).
+            engine_first {bool}: If True the engine plays the first move.
+            owner {str}: client owning the session (defaults to a client of its own).
+            deadline {float}: time allowed for the first engine move in seconds (None for none).
+
+        Returns:
+            {dict}: state of the session (see GameSession.state()).
+
+        Raises:
+            ServerError if the board size, k, engine options or deadline are invalid, or the 
+            first engine move failed (the session is then removed).
+        """
+        deadline = self._check_deadline(deadline)
+        try:
+            size, k = (int(size[0]), int(size[1])), int(k)
+        except (TypeError, ValueError, IndexError):
+            raise ServerError(f"Invalid board size {size!r} or k {k!r}.")
+        if min(size) < 1 or not 1 < k <= max(size):
+            raise ServerError(f"Invalid board size {size!r} or k {k!r}.")
+
+        session_id = next(self._ids)
+        engine = client_engine(engine, self.engine)
+        engine.pop("ponder", None) #workers serve other sessions between moves
+        session = GameSession(session_id, owner if owner is not None else f"session-{session_id}",
+                              size, k, engine, engine_first)
+        self.sessions[session_id] = session
+        response = session.state()
+        if engine_first:
+            try:
+                response.update(await self._engine_move(session, deadline))
+            except ServerError:
+                #the client never learns the id of the session, which could not be resumed
+                del self.sessions[session_id]
+                raise
+        return response
+
+    async def play(self, session_id, column, deadline=None):
+        """Plays a move of the client and waits for the reply of the engine.
+
+        Args:
+            session_id {int}: identifier of the session.
+            column {int}: column played by the client.
+            deadline {float}: time allowed for the reply in seconds (None for no deadline).
+
+        Returns:
+            {dict}: state of the session, with the column of the engine, the latency of the
+                    request and the search statistics if the engine has replied.
+
+        Raises:
+            ServerError if the session is unknown or busy, the move or deadline is invalid or 
+            the deadline was missed.
+        """
+        deadline = self._check_deadline(deadline)
+        session = self._session(session_id)
+        if session.busy:
+            raise ServerError(f"Session {session_id} is waiting for the engine.")
+        if session.board.num_moves % 2 + 1 == session.engine_player:
+            raise ServerError("It is the turn of the engine.")
+        session.apply(column)
+        response = session.state()
+        if not session.board.is_terminal():
+            response.update(await self._engine_move(session, deadline))
+        return response
+
+    async def engine_move(self, session_id, deadline=None):
+        """Asks the engine to play when it is its turn (eg to retry a request that missed its 
+        deadline).
+
+        Args:
+            session_id {int}: identifier of the session.
+            deadline {float}: time allowed for the move in seconds (None for no deadline).
+
+        Returns:
+            {dict}: state of the session with the column of the engine, the latency of the
+                    request and the search statistics.
+
+        Raises:
+            ServerError if the session is unknown or busy, it is not the turn of the engine or 
+            the deadline is invalid or was missed.
+        """
+        deadline = self._check_deadline(deadline)
+        session = self._session(session_id)
+        if session.busy:
+            raise ServerError(f"Session {session_id} is waiting for the engine.")
+        if session.board.is_terminal() or session.board.num_moves % 2 + 1 != session.engine_player:
+            raise ServerError("It is not the turn of the engine.")
+        response = session.state()
+        response.update(await self._engine_move(session, deadline))
+        return response
+
+    def close_game(self, session_id):
+        """Removes a session and returns its final state."""
+        session = self._session(session_id)
+        del self.sessions[session_id]
+        return session.state()
+
+    @staticmethod
+    def _check_deadline(deadline):
+        """Validates the deadline of a request (a positive number of seconds or None)."""
+        if deadline is None:
+            return None
+        if isinstance(deadline, bool) or not isinstance(deadline, (int, float)) or not deadline > 0:
+            raise ServerError(f"Invalid deadline {deadline!r}, expected a positive number of seconds.")
+        return float(deadline)
+
+    def _session(self, session_id):
+        """Retrieves a session, raising ServerError if it does not exist."""
+        if session_id not in self.sessions:
+            raise ServerError(f"Unknown session {session_id!r}.")
+        return self.sessions[session_id]
+
+    async def _engine_move(self, session, deadline):
+        """Queues the search of the engine move of a session and plays it once found."""
+        loop = asyncio.get_running_loop()
+        if self.executor is None:
+            await self.start()
+        start = loop.time()
+        job = {"session": session, "future": loop.create_future(), "queued": start, "started": False,
+               "deadline": start + deadline if deadline is not None else None}
+        self._queues.setdefault(session.owner, deque()).append(job)
+        self.stats["requests"] += 1
+        session.busy = True
+        self._wakeup.set()
+        #the client gets its answer at the deadline even if the job is still queued or searching
+        timer = loop.call_at(job["deadline"], self._expire, job) if deadline is not None else None
+        try:
+            column, stats, queue_time = await job["future"]
+        finally:
+            session.busy = False
+            if timer is not None:
+                timer.cancel()
+
+        session.apply(column)
+        record = {"column": column, "latency": loop.time() - start, "queue_time": queue_time, "search": stats}
+        session.records.append(record)
+        response = session.state()
+        response.update(record)
+        return response
+
+    async def _dispatch(self):
+        """Sends the queued jobs to the workers, one owner at a time in turn."""
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queues or not self._free_workers:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            #next owner in turn: served once, then moved to the back of the line
+            owner, queue = next(iter(self._queues.items()))
+            job = queue.popleft()
+            del self._queues[owner]
+            if queue:
+                self._queues[owner] = queue
+            if job["future"].done():
+                continue #expired while queued (or cancelled by the client)
+
+            now = loop.time()
+            time_limit = None
+            if job["deadline"] is not None:
+                time_limit = job["deadline"] - now - self.margin
+                if time_limit <= 0:
+                    self._expire(job)
+                    continue
+
+            job["started"] = True
+            session = job["session"]
+            self._free_workers -= 1
+            future = loop.run_in_executor(self.executor, _select_move, session.moves,
+                                          (session.board.width, session.board.height), session.board.k,
+                                          session.engine, time_limit)
+            future.add_done_callback(lambda done, job=job, queued=now - job["queued"]: self._finish(job, done, queued))
+
+    def _expire(self, job):
+        """Fails a job whose deadline has passed (its search, if started, still runs to the end
+        and keeps its worker busy until then)."""
+        if job["future"].done():
+            return
+        self.stats["expired"] += 1
+        when = "during" if job["started"] else "before"
+        job["future"].set_exception(ServerError(f"Deadline exceeded {when} the search."))
+
+    def _finish(self, job, done, queue_time):
+        """Frees the worker of a finished search and resolves the future of its job."""
+        self._free_workers += 1
+        self._wakeup.set()
+        if job["future"].done():
+            return
+        if done.exception() is not None:
+            self.stats["failed"] += 1
+            job["future"].set_exception(ServerError(f"Search failed: {done.exception()!r}"))
+        else:
+            self.stats["completed"] += 1
+            column, stats = done.result()
+            job["future"].set_result((column, stats, queue_time))
+
+    async def handle(self, request, owner=None):
+        """Serves a request given as a dictionary.
+
+        Requests:
+            {"op": "new", "size": [7, 6], "k": 4, "engine": {...}, "engine_first": false, "deadline": 1.0}
+            {"op": "move", "session": 1, "column": 4, "deadline": 1.0}
+            {"op": "engine", "session": 1, "deadline": 1.0}
+            {"op": "close", "session": 1}
+            {"op": "stats"}
+
+        Args:
+            request {dict}: request (see above, every field but "op" and "session" is optional).
+            owner {str}: client sending the request (owner of the sessions it creates).
+
+        Returns:
+            {dict}: response with "ok" True and the result, or "ok" False and an "error" (for 
+                    invalid requests as well as unexpected failures, so that a client is never 
+                    disconnected by its requests).
+        """
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "Requests must be JSON objects."}
+        try:
+            op = request.get("op")
+            if op == "new":
+                response = await self.new_game(request.get("size", (7, 6)), request.get("k", 4), request.get("engine"),
+                                               request.get("engine_first", False), owner, request.get("deadline"))
+            elif op == "move":
+                response = await self.play(request.get("session"), request.get("column"), request.get("deadline"))
+            elif op == "engine":
+                response = await self.engine_move(request.get("session"), request.get("deadline"))
+            elif op == "close":
+                response = self.close_game(request.get("session"))
+            elif op == "stats":
+                response = dict(self.stats, sessions=len(self.sessions), workers=self.workers,
+                                queued=sum(len(queue) for queue in self._queues.values()))
+            else:
+                raise ServerError(f"Unknown operation {op!r}.")
+        except ServerError as error:
+            return {"ok": False, "error": str(error)}
+        except Exception as error:
+            return {"ok": False, "error": f"Request failed: {error!r}"}
+        response["ok"] = True
+        return response
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """Starts serving clients over TCP, one JSON request per line and one JSON response per
+        line (see handle()). Each connection is an owner for fair queueing.
+
+        Returns:
+            server {asyncio.Server}: listening server (close it to stop accepting clients).
+        """
+        await self.start()
+        clients = itertools.count(1)
+
+        async def client(reader, writer):
+            owner = f"client-{next(clients)}"
+            try:
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    try:
+                        request = json.loads(line)
+                    except ValueError:
+                        response = {"ok": False, "error": "Invalid JSON."}
+                    else:
+                        response = await self.handle(request, owner)
+                    writer.write((json.dumps(response) + "\n").encode())
+                    await writer.drain()
+            finally:
+                writer.close()
+
+        return await asyncio.start_server(client, host, port)
+
+
+async def _main(args):
+    engine = json.loads(args.engine) if args.engine is not None else None
+    if args.snapshot is not None:
+        engine = dict(engine or DEFAULT_ENGINE, snapshot=args.snapshot)
+    async with GameServer(args.workers, engine) as server:
+        listener = await server.serve(args.host, args.port)
+        print(f"Serving on {args.host}:{args.port} with {server.workers} workers")
+        async with listener:
+            await listener.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Hosts Connect 4 games against engines over TCP (JSON lines).")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--workers", type=int, default=None, help="number of search worker processes")
+    parser.add_argument("--engine", default=None, help="JSON configuration of the default engine")
+    parser.add_argument("--snapshot", default=None, help="cache snapshot the engine workers start from (see snapshot.py)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,182 @@
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+from board import Board, get_window_weights, get_zobrist_keys
+from transposition import TranspositionTable
+
+MAGIC = b"C4SNAP"
+VERSION = 1
+#magic, version, width, height, k, replacement policy of the table, fingerprint of the hashing and
+#heuristic, number of slots of the table, number of table entries and number of cached evaluations
+#(48 bytes, so that the arrays that follow are 8-byte aligned)
+HEADER = struct.Struct("<6sHBBBB4xQQQQ")
+#arrays of the table entries, then of the cached evaluations, in file order
+TABLE_COLUMNS = (("keys", "<u8"), ("values", "<f8"), ("slots", "<u4"), ("depths", "<i2"), ("flags", "u1"), ("moves", "i1"))
+
+
+def cache_fingerprint(player, size, k):
+    """Retrieves a 64-bit fingerprint of everything the cached values of a player depend on besides
+    the positions: the Zobrist keys of the board size (which define the position hashes), the
+    window weights of k and the heuristic the player evaluates positions with.
+
+    Args:
+        player {SearchPlayer()}: player whose caches are saved or loaded.
+        size (tuple[int, int]): (width, height) of the board.
+        k {int}: number of connected positions needed to win a game.
+
+    Returns:
+        {int}: fingerprint of the caches.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(np.array(get_zobrist_keys(*size), dtype="<u8").tobytes())
+    digest.update(np.asarray(get_window_weights(k), dtype="<f8").tobytes())
+    digest.update(type(player).heuristic.__qualname__.encode())
+    return int.from_bytes(digest.digest(), "little")
+
+
+def save_snapshot(path, player, size, k):
+    """Writes the transposition table and evaluation cache of a player to a file, so that a new
+    player (eg in a restarted worker) can start from them (see load_snapshot()).
+
+    The file holds a header followed by the columns of the filled table slots (keys, values,
+    slot indices, depths, flags and moves, 24 bytes per entry) and of the cached evaluations
+    (keys and values, least recently used first, 16 bytes per entry). The file is written
+    under a temporary name and then renamed, so readers never see a partial snapshot.
+
+    Args:
+        path {str}: file to write.
+        player {SearchPlayer()}: player whose caches are saved.
+        size (tuple[int, int]): (width, height) of the boards the player has searched.
+        k {int}: number of connected positions needed to win a game.
+
+    Returns:
+        num_entries {int}: number of transposition table entries written.
+        num_evaluations {int}: number of cached evaluations written.
+    """
+    table = player.table
+    entries = table.dump() if table is not None else {name: np.zeros(0, dtype=dtype) for name, dtype in TABLE_COLUMNS}
+    eval_keys, eval_values = player.eval_cache.dump() if player.eval_cache is not None else (np.zeros(0), np.zeros(0))
+    num_slots = table.num_slots if table is not None else 0
+    policy = TranspositionTable.policies.index(table.replacement) if table is not None else 0
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as snapshot_file:
+        snapshot_file.write(HEADER.pack(MAGIC, VERSION, size[0], size[1], k, policy, cache_fingerprint(player, size, k),
+                                        num_slots, len(entries["keys"]), len(eval_keys)))
+        for name, dtype in TABLE_COLUMNS:
+            snapshot_file.write(entries[name].astype(dtype).tobytes())
+        snapshot_file.write(eval_keys.astype("<u8").tobytes())
+        snapshot_file.write(eval_values.astype("<f8").tobytes())
+    os.replace(temporary, path)
+    return len(entries["keys"]), len(eval_keys)
+
+
+def read_header(path):
+    """Reads the header of a snapshot.
+
+    Args:
+        path {str}: file written by save_snapshot().
+
+    Returns:
+        {tuple}: (width, height, k, replacement policy index, fingerprint, number of table slots,
+                 number of table entries, number of cached evaluations) of the snapshot.
+
+    Raises:
+        ValueError if the file is not a snapshot of a supported version.
+    """
+    with open(path, "rb") as snapshot_file:
+        header = snapshot_file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{path!r} is not a cache snapshot.")
+    magic, version, *fields = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path!r} is not a cache snapshot of version {VERSION}.")
+    return tuple(fields)
+
+
+def load_snapshot(path, player, size=None, k=None):
+    """Replaces the transposition table and evaluation cache of a player by those of a snapshot
+    (see save_snapshot()). The file is memory-mapped and copied into the caches in bulk.
+
+    Args:
+        path {str}: file written by save_snapshot().
+        player {SearchPlayer()}: player whose caches are loaded (caches it does not have are
+                                 skipped).
+        size (tuple[int, int]): (width, height) of the boards the player will search (None to
+                                accept the size of the snapshot).
+        k {int}: number of connected positions needed to win a game (None to accept the k of
+                 the snapshot).
+
+    Returns:
+        num_entries {int}: number of transposition table entries loaded.
+        num_evaluations {int}: number of cached evaluations loaded.
+
+    Raises:
+        ValueError if the file is not a snapshot of a supported version, or was saved for
+        another board size, k or heuristic.
+    """
+    width, height, snapshot_k, policy, fingerprint, num_slots, num_entries, num_evaluations = read_header(path)
+    if (size is not None and tuple(size) != (width, height)) or (k is not None and k != snapshot_k):
+        raise ValueError(f"{path!r} is a snapshot of {width}x{height} boards with k={snapshot_k}.")
+    if fingerprint != cache_fingerprint(player, (width, height), snapshot_k):
+        raise ValueError(f"{path!r} was saved with other position hashes or another heuristic.")
+
+    data = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) > HEADER.size else np.zeros(0, dtype=np.uint8)
+    offset = HEADER.size
+    entries = {}
+    for name, dtype in TABLE_COLUMNS:
+        end = offset + np.dtype(dtype).itemsize * num_entries
+        entries[name] = data[offset:end].view(dtype)
+        offset = end
+    eval_keys = data[offset:offset + 8*num_evaluations].view("<u8")
+    eval_values = data[offset + 8*num_evaluations:offset + 16*num_evaluations].view("<f8")
+
+    num_loaded, num_evaluations_loaded = 0, 0
+    if player.table is not None:
+        player.table.load(entries, num_slots, TranspositionTable.policies[policy])
+        num_loaded = len(player.table)
+    if player.eval_cache is not None:
+        player.eval_cache.load(eval_keys, eval_values)
+        num_evaluations_loaded = len(player.eval_cache)
+    return num_loaded, num_evaluations_loaded
+
+
+if __name__ == '__main__':
+    from book import book_positions
+    from player import AlphaBetaPlayer
+    from transposition import EvaluationCache
+
+    parser = argparse.ArgumentParser(description="Warms up the caches of a search player and saves them to a snapshot.")
+    parser.add_argument("output", help="file to write the snapshot to")
+    parser.add_argument("--size", type=int, nargs=2, default=(7, 6), help="width and height of the board")
+    parser.add_argument("--k", type=int, default=4, help="number of connected pieces needed to win")
+    parser.add_argument("--plies", type=int, default=2, help="number of moves of the deepest positions searched")
+    parser.add_argument("--depth", type=int, default=7, help="search depth of the positions")
+    parser.add_argument("--tt-entries", type=int, default=2**20, help="number of entries of the transposition table")
+    parser.add_argument("--eval-cache", type=int, default=2**18, help="capacity of the evaluation cache")
+    args = parser.parse_args()
+    size = tuple(args.size)
+
+    player = AlphaBetaPlayer(max_depth=args.depth, tt_entries=args.tt_entries, verbose=False, solver_threshold=None,
+                             eval_cache=EvaluationCache(args.eval_cache))
+    start = time.perf_counter()
+    positions = book_positions(size, args.k, args.plies)
+    for moves in positions:
+        player.select_target(Board.from_moves(moves, size, args.k))
+    print(f"{len(positions)} positions searched ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+
+    num_entries, num_evaluations = save_snapshot(args.output, player, size, args.k)
+    print(f"{num_entries} table entries and {num_evaluations} evaluations written to {args.output} "
+          f"({os.path.getsize(args.output)} bytes)", file=sys.stderr)
+
+    fresh = AlphaBetaPlayer(max_depth=args.depth, tt_entries=args.tt_entries, verbose=False, solver_threshold=None,
+                            eval_cache=EvaluationCache(args.eval_cache))
+    start = time.perf_counter()
+    load_snapshot(args.output, fresh, size, args.k)
+    print(f"snapshot loaded in {1000 * (time.perf_counter() - start):.1f}ms", file=sys.stderr)
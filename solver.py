@@ -0,0 +1,193 @@
+from board import Board
+from ordering import center_order
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+
+class Solver():
+    """ Exact solver for positions close to the end of the game.
+
+    Positions are scored from the point of view of the player to move: a win on the m-th move of
+    the game is worth (number of cells + 1 - m), a loss on the m-th move the opposite and a draw 0,
+    so faster wins (and slower losses) score higher. The search is a negamax over the raw
+    bitboards of the Board() (the pieces of the player to move and the mask of all pieces), with
+    a transposition table keyed by position + mask (unique for boards of up to 64 bits, folded
+    modulo the prime 2**61-1 for larger boards), a null-window bisection on the score and
+    threat detection: immediate wins are played, immediate threats of the opponent must be
+    blocked and moves directly under an opponent threat are never played.
+    """
+    def __init__(self, tt_entries=2**20):
+        """ Initialises a solver.
+
+        Args:
+            tt_entries {int}: maximum number of entries of the transposition table.
+        """
+        self.table = TranspositionTable(tt_entries, "always")
+        self.geometry = None #Board() of the size being solved, used for its masks and threats
+        self.nodes = 0
+        self.budget = None #called every 256 nodes, may raise to abort the search (eg SearchPlayer.check_budget)
+
+    def _set_board(self, board):
+        """Prepares the solver for the size and k of a board (clearing the table if it changed)."""
+        if self.geometry is None or (self.geometry.width, self.geometry.height, self.geometry.k) != (board.width, board.height, board.k):
+            self.geometry = Board((board.width, board.height), board.k)
+            self.table.clear()
+            #cells of every column, from the center outwards
+            column = (1 << board.height) - 1
+            self.column_masks = [column << ((col-1) * board.stride) for col in center_order(board.width)]
+            self.num_cells = board.width * board.height
+            #keys of boards wider than 64 bits are folded to fit in the table
+            self.fold_keys = board.width * board.stride > 64
+
+    def negamax(self, position, mask, moves, alpha, beta):
+        """Function used to recursively retrieve the exact score of a position within (alpha, beta).
+
+        Args:
+            position {int}: bitboard of the pieces of the player to move.
+            mask {int}: bitboard of all the pieces on the board.
+            moves {int}: number of pieces on the board.
+            alpha {int}: score already secured by the player to move.
+            beta {int}: score the opponent can hold the player to move to.
+
+        Returns:
+            {int}: exact score if it lies in (alpha, beta), otherwise a bound on the wrong side
+                   of the window (fail-hard).
+        """
+        self.nodes += 1
+        if self.budget is not None and self.nodes % 256 == 0:
+            self.budget()
+        geometry = self.geometry
+        total = self.num_cells
+        if moves == total:
+            return 0
+
+        possible = geometry.playable_cells(mask)
+        if geometry.winning_cells(position, mask) & possible:
+            return total - moves
+
+        opponent_wins = geometry.winning_cells(position ^ mask, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                return -(total - moves - 1) #two threats to block, the opponent wins next move
+            possible = forced
+        possible &= ~(opponent_wins >> 1) #never play directly under a threat of the opponent
+        if not possible:
+            return -(total - moves - 1)
+
+        #the player to move can not win before their next move, nor lose before the opponent's next move
+        alpha = max(alpha, min(-(total - moves - 3), 0))
+        beta = min(beta, max(total - moves - 2, 0))
+        if alpha >= beta:
+            return alpha
+
+        key = position + mask
+        if self.fold_keys:
+            key %= (1 << 61) - 1
+        entry = self.table.probe(key)
+        if entry is not None:
+            _, _, value, flag, _ = entry
+            value = int(value)
+            if flag == EXACT:
+                return value
+            elif flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        #moves creating the most threats first, ties broken from the center outwards
+        candidates = []
+        for column in self.column_masks:
+            move = possible & column
+            if move:
+                threats = bin(geometry.winning_cells(position | move, mask | move)).count("1")
+                candidates.append((-threats, len(candidates), move))
+        candidates.sort()
+
+        alpha_orig = alpha
+        for _, _, move in candidates:
+            value = -self.negamax(position ^ mask, mask | move, moves + 1, -beta, -alpha)
+            if value >= beta:
+                self.table.store(key, 0, value, LOWER, None)
+                return value
+            if value > alpha:
+                alpha = value
+        self.table.store(key, 0, alpha, EXACT if alpha > alpha_orig else UPPER, None)
+        return alpha
+
+    def solve_bitboards(self, position, mask, moves):
+        """Retrieves the exact score of a position by narrowing the score range with null-window
+        searches (see negamax() for the arguments)."""
+        total = self.num_cells
+        low, high = -(total - moves), total - moves
+        while low < high:
+            med = low + (high - low) // 2
+            if med <= 0 and low // 2 < med:
+                med = low // 2
+            elif med >= 0 and high // 2 > med:
+                med = high // 2
+            value = self.negamax(position, mask, moves, med, med + 1)
+            if value <= med:
+                high = value
+            else:
+                low = value
+        return low
+
+    def solve(self, board):
+        """Retrieves the exact score of a board for the player to move.
+
+        Args:
+            board {Board()}: board object to indicate current state of game.
+
+        Returns:
+            score {int}: score of the state (see Solver).
+        """
+        self._set_board(board)
+        if board.winner:
+            return -(self.num_cells + 1 - board.num_moves)
+        position = board.masks[board.num_moves % 2]
+        mask = board.masks[0] | board.masks[1]
+        return self.solve_bitboards(position, mask, board.num_moves)
+
+    def best_move(self, board):
+        """Retrieves the best move of a board with its exact score.
+
+        Args:
+            board {Board()}: board object to indicate current state of game.
+
+        Returns:
+            best_move {int}: column of the fastest win (or slowest loss).
+            best_score {int}: score of the state for the player to move.
+        """
+        self._set_board(board)
+        best_move, best_score = None, None
+        symmetric = board.is_symmetric()
+        for col in center_order(board.width):
+            if not board.is_valid(col) or (symmetric and col > board.mirror_move(col)):
+                continue
+            board.make_move(board.get_cell(col), recursion=True)
+            try:
+                score = -self.solve(board)
+            finally:
+                board.unmake_move()
+            if best_score is None or score > best_score:
+                best_move, best_score = col, score
+        return best_move, best_score
+
+    def result(self, board, score):
+        """Converts a score into the game-theoretic result of a board.
+
+        Args:
+            board {Board()}: board object the score was computed for.
+            score {int}: score of the state for the player to move.
+
+        Returns:
+            value {int}: 1 if the player to move wins, -1 if they lose, 0 for a draw.
+            distance {int}: number of moves left until the game ends with perfect play (None
+                            for a draw, which ends when the board is full).
+        """
+        if score == 0:
+            return 0, None
+        end = board.width * board.height + 1 - abs(score) #number of pieces on the board when the game is won
+        return (1 if score > 0 else -1), end - board.num_moves
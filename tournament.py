@@ -0,0 +1,231 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import json
+import random
+import sys
+
+from board import Board
+from game import Game
+from player import AlphaBetaPlayer, MiniMaxPlayer
+from records import RecordWriter
+from transposition import EvaluationCache
+
+_worker_caches = {} #evaluation cache of each (size, k, capacity), kept between the games of a worker
+
+
+def make_player(config):
+    """Creates a search player from a configuration.
+
+    Args:
+        config {dict}: "type" ("alphabeta" or "minimax", defaults to "alphabeta") and the keyword
+                       arguments of the player class (eg {"type": "alphabeta", "max_depth": 6}).
+
+    Returns:
+        player {Player()}: player that never prints.
+
+    Raises:
+        ValueError if the player type is unknown.
+    """
+    options = dict(config)
+    kind = options.pop("type", "alphabeta")
+    if kind == "alphabeta":
+        return AlphaBetaPlayer(verbose=False, **options)
+    elif kind == "minimax":
+        return MiniMaxPlayer(**options)
+    raise ValueError(f"Unknown player type {kind!r}, expected 'alphabeta' or 'minimax'.")
+
+
+def parse_moves(text):
+    """Parses the columns of a sequence of moves.
+
+    Args:
+        text {str}: columns separated by spaces or commas (eg "10 3 4"), or a move string of 
+                    one digit per move (eg "4453").
+
+    Returns:
+        moves {list}: columns played (see Board.from_moves()).
+    """
+    fields = text.replace(",", " ").split()
+    if len(fields) == 1:
+        return [int(move) for move in fields[0]]
+    return [int(field) for field in fields]
+
+
+def random_opening(plies, size, k, rng, attempts=1000):
+    """Generates a random opening of a number of plies that does not end the game.
+
+    Args:
+        plies {int}: number of moves of the opening.
+        size (tuple[int, int]): (width, height) of the board.
+        k {int}: number of connected positions needed to win a game.
+        rng {random.Random}: random number generator.
+        attempts {int}: number of random openings tried before giving up.
+
+    Returns:
+        moves {list}: columns of the opening (see Board.from_moves()).
+
+    Raises:
+        ValueError if the opening would fill the board, or no opening of attempts tried 
+        leaves the game going.
+    """
+    if plies >= size[0] * size[1]:
+        raise ValueError(f"An opening of {plies} plies fills a {size[0]}x{size[1]} board.")
+    for _ in range(attempts):
+        board = Board(size, k)
+        moves = []
+        for _ in range(plies):
+            col = rng.choice([col for col in range(1, board.width+1) if board.is_valid(col)])
+            board.make_move(board.get_cell(col))
+            moves.append(col)
+            if board.is_terminal():
+                break
+        if not board.is_terminal():
+            return moves
+    raise ValueError(f"No random opening of {plies} plies that does not end the game found in {attempts} attempts.")
+
+
+def play_game(task):
+    """Plays a single game without any output.
+
+    Args:
+        task {dict}: game number, configurations of the "first" and "second" players (with
+                     their "label"), the "opening" moves, board "size", "k" and the capacity 
+                     of the evaluation cache shared by the games of a worker ("eval_cache", 
+                     None for no cache).
+
+    Returns:
+        record {dict}: game number, labels of both players, opening, moves played, winner
+                       (1 if the first player won, 2 if the second player won, 0 for a draw),
+                       the time taken and states visited for every move of the players and 
+                       the hit rate of the evaluation cache during the game (None without cache).
+    """
+    cache = None
+    if task.get("eval_cache"):
+        key = (tuple(task["size"]), task["k"], task["eval_cache"])
+        if key not in _worker_caches:
+            _worker_caches[key] = EvaluationCache(task["eval_cache"])
+        cache = _worker_caches[key]
+        cache.reset_stats()
+
+    game = Game(make_player(task["first"]["config"]), make_player(task["second"]["config"]),
+                size=task["size"], k=task["k"], quiet=True, eval_cache=cache)
+    winner = game.play(opening=task["opening"])
+
+    return {
+        "game": task["game"],
+        "first": task["first"]["label"],
+        "second": task["second"]["label"],
+        "opening": list(task["opening"]),
+        "moves": [record["column"] for record in game.records],
+        "winner": winner,
+        "move_times": game.times_list,
+        "states_visited": game.states_visited_list,
+        "eval_hit_rate": cache.stats()["hit_rate"] if cache is not None else None,
+    }
+
+
+def make_tasks(engine_a, engine_b, num_games, size=(7, 6), k=4, openings=None, random_plies=0,
+               swap_colors=True, seed=0, eval_cache=None):
+    """Creates the games of a match between two engines.
+
+    Args:
+        engine_a {dict}: configuration of the first engine (see make_player()).
+        engine_b {dict}: configuration of the second engine.
+        num_games {int}: number of games.
+        size (tuple[int, int]): (width, height) of the board.
+        k {int}: number of connected positions needed to win a game.
+        openings {list}: book of openings (lists of columns) played in turn (None for no book).
+        random_plies {int}: number of random moves of each opening when there is no book.
+        swap_colors {bool}: If True each opening is played twice, once with each engine starting.
+        seed {int}: seed of the random openings.
+        eval_cache {int}: capacity of the evaluation cache shared by both engines and by the 
+                          games played by the same worker process (None for no cache).
+
+    Returns:
+        tasks {list}: tasks for play_game().
+    """
+    rng = random.Random(seed)
+    players = [{"label": "a", "config": engine_a}, {"label": "b", "config": engine_b}]
+    tasks = []
+    opening = []
+    for game in range(num_games):
+        if not swap_colors or game % 2 == 0:
+            if openings:
+                opening = openings[(game // (2 if swap_colors else 1)) % len(openings)]
+            else:
+                opening = random_opening(random_plies, size, k, rng)
+        first, second = players if not swap_colors or game % 2 == 0 else players[::-1]
+        tasks.append({"game": game, "first": first, "second": second, "opening": opening,
+                      "size": tuple(size), "k": k, "eval_cache": eval_cache})
+    return tasks
+
+
+def run_tournament(tasks, output=None, workers=None, writer=None):
+    """Plays games in a pool of processes, streaming every record as a JSON line as soon as its
+    game has finished.
+
+    Args:
+        tasks {list}: tasks created by make_tasks().
+        output {file}: file object the JSON lines are written to (None to only summarise).
+        workers {int}: number of worker processes (defaults to the number of CPUs).
+        writer {RecordWriter()}: compact record file the games are also added to (None not to
+                                 write one).
+
+    Returns:
+        summary {dict}: wins, draws and losses of engine "a" and the number of games played.
+    """
+    summary = {"games": 0, "wins": 0, "draws": 0, "losses": 0}
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(play_game, task) for task in tasks]
+        for future in as_completed(futures):
+            record = future.result()
+            winner_label = (None, record["first"], record["second"])[record["winner"]]
+            record["result_a"] = "draw" if winner_label is None else ("win" if winner_label == "a" else "loss")
+            summary["games"] += 1
+            summary[{"win": "wins", "draw": "draws", "loss": "losses"}[record["result_a"]]] += 1
+            if output is not None:
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+            if writer is not None:
+                metrics = [{"wall_time": wall_time, "states_visited": states}
+                           for wall_time, states in zip(record["move_times"], record["states_visited"])]
+                writer.add(list(record["opening"]) + list(record["moves"]), record["winner"], len(record["opening"]),
+                           metrics)
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Plays engine-vs-engine games in parallel.")
+    parser.add_argument("--a", default='{"type": "alphabeta", "max_depth": 4}', help="JSON configuration of engine a")
+    parser.add_argument("--b", default='{"type": "alphabeta", "max_depth": 3}', help="JSON configuration of engine b")
+    parser.add_argument("--games", type=int, default=10, help="number of games")
+    parser.add_argument("--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--size", type=int, nargs=2, default=(7, 6), help="width and height of the board")
+    parser.add_argument("--k", type=int, default=4, help="number of connected pieces needed to win")
+    parser.add_argument("--random-plies", type=int, default=2, help="random moves of each opening")
+    parser.add_argument("--book", default=None, help="file with one opening per line (a move string, or columns separated "
+                                                     "by spaces or commas on boards wider than 9 columns), # for comments")
+    parser.add_argument("--no-swap", action="store_true", help="do not replay openings with colours swapped")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random openings")
+    parser.add_argument("--eval-cache", type=int, default=None, help="capacity of the evaluation cache of each worker")
+    parser.add_argument("--output", default=None, help="JSONL file to write the records to (stdout by default)")
+    parser.add_argument("--records", default=None, help="compact game record file to append the games to (see records.py)")
+    args = parser.parse_args()
+
+    openings = None
+    if args.book is not None:
+        with open(args.book) as book:
+            openings = [parse_moves(line) for line in book if not line.startswith("#")]
+
+    tasks = make_tasks(json.loads(args.a), json.loads(args.b), args.games, tuple(args.size), args.k,
+                       openings, args.random_plies, not args.no_swap, args.seed, args.eval_cache)
+    output = open(args.output, "a") if args.output is not None else sys.stdout
+    writer = RecordWriter(args.records, tuple(args.size), args.k) if args.records is not None else None
+    try:
+        summary = run_tournament(tasks, output, args.workers, writer)
+    finally:
+        if args.output is not None:
+            output.close()
+        if writer is not None:
+            writer.close()
+    print(json.dumps(summary), file=sys.stderr)
@@ -0,0 +1,353 @@
+from array import array
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+EXACT = 0 #value is the exact minimax value of the position
+LOWER = 1 #search failed high, value is a lower bound
+UPPER = 2 #search failed low, value is an upper bound
+
+
+class TranspositionTable():
+    """ Bounded table of search results indexed by the Zobrist hash of a position.
+
+    Each entry is a tuple (key, depth, value, flag, move), where depth is the remaining search
+    depth the value was computed with, flag is one of EXACT, LOWER or UPPER and move is the best
+    move found (or None). Entries live in a fixed number of slots chosen by key % number of slots,
+    so the memory used never grows beyond max_entries.
+
+    Slots are stored column-wise in preallocated arrays of machine types (20 bytes per slot:
+    64-bit key, 16-bit depth, 64-bit value, 8-bit flag and 8-bit move), so storing an entry
+    allocates no Python objects and the memory of the table does not grow with the search.
+    Keys must therefore fit in 64 bits, and moves in a signed byte.
+
+    Replacement policies:
+        - "depth": depth-preferred, a slot is only replaced by an entry searched at least as deep.
+        - "always": the newest entry always replaces the slot.
+        - "two-tier": each bucket holds a depth-preferred slot and an always-replace slot.
+    """
+    policies = ("depth", "always", "two-tier")
+
+    def __init__(self, max_entries=2**20, replacement="depth"):
+        """ Initialises an empty table.
+
+        Args:
+            max_entries (int): maximum number of entries stored. Defaults to 2**20.
+            replacement (str): replacement policy, one of "depth", "always" or "two-tier".
+                Defaults to "depth".
+
+        Raises:
+            ValueError if the replacement policy is unknown or max_entries is too small.
+        """
+        if replacement not in self.policies:
+            raise ValueError(f"Unknown replacement policy {replacement!r}, expected one of {self.policies}.")
+        if max_entries < (2 if replacement == "two-tier" else 1):
+            raise ValueError(f"max_entries must be large enough for one bucket, got {max_entries}.")
+
+        self.max_entries = max_entries
+        self.replacement = replacement
+        self.num_buckets = max_entries // 2 if replacement == "two-tier" else max_entries
+        self.num_slots = self.num_buckets * (2 if replacement == "two-tier" else 1)
+        self.clear()
+        self.reset_stats()
+
+    def __len__(self):
+        return self.filled
+
+    def reset_stats(self):
+        """Resets the hit, miss, store and overwrite counters."""
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def stats(self):
+        """Returns the table counters as a dictionary.
+
+        Returns:
+            {dict}: hits, misses, stores, overwrites (entries of a different position evicted),
+                    number of entries filled and maximum number of entries.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "entries": self.filled,
+            "max_entries": self.num_slots,
+        }
+
+    def clear(self):
+        """Removes every entry from the table."""
+        self.keys = array("Q", bytes(8 * self.num_slots))
+        self.depths = array("h", [-1]) * self.num_slots #-1 marks an empty slot
+        self.values = array("d", bytes(8 * self.num_slots))
+        self.flags = bytearray(self.num_slots)
+        self.moves = array("b", [-1]) * self.num_slots #-1 stands for no move
+        self.filled = 0
+
+    def _get(self, index):
+        """Retrieves the entry of slot index as a tuple (None if the slot is empty)."""
+        depth = self.depths[index]
+        if depth < 0:
+            return None
+        move = self.moves[index]
+        return (self.keys[index], depth, self.values[index], self.flags[index], move if move >= 0 else None)
+
+    def _set(self, index, entry):
+        """Writes an entry tuple (or None to empty it) in slot index, without updating counters."""
+        if entry is None:
+            self.depths[index] = -1
+            return
+        key, depth, value, flag, move = entry
+        self.keys[index] = key
+        self.depths[index] = depth
+        self.values[index] = value
+        self.flags[index] = flag
+        self.moves[index] = move if move is not None else -1
+
+    def probe(self, key):
+        """Looks up the entry stored for a position.
+
+        Args:
+            key {int}: Zobrist hash of the position.
+
+        Returns:
+            {tuple}: (key, depth, value, flag, move) entry, or None if the position is not stored.
+        """
+        if self.replacement == "two-tier":
+            index = 2 * (key % self.num_buckets)
+            for slot in (index, index + 1):
+                if self.keys[slot] == key and self.depths[slot] >= 0:
+                    self.hits += 1
+                    return self._get(slot)
+        else:
+            index = key % self.num_buckets
+            if self.keys[index] == key and self.depths[index] >= 0:
+                self.hits += 1
+                return self._get(index)
+
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, flag, move):
+        """Stores a search result according to the replacement policy.
+
+        Args:
+            key {int}: Zobrist hash of the position.
+            depth {int}: remaining depth the position was searched to.
+            value {float}: value returned by the search.
+            flag {int}: EXACT, LOWER or UPPER.
+            move {int}: best move found from the position (None if unknown).
+        """
+        entry = (key, depth, value, flag, move)
+        if self.replacement == "two-tier":
+            index = 2 * (key % self.num_buckets)
+            deep, recent = self._get(index), self._get(index + 1)
+            if deep is None or deep[0] == key or depth >= deep[1]:
+                if recent is not None and recent[0] == key:
+                    #drop the stale copy of the position from the always-replace slot
+                    self._set(index + 1, None)
+                    recent = None
+                    self.filled -= 1
+                if deep is None:
+                    self.filled += 1
+                elif deep[0] != key:
+                    #demote the previous deep entry to the always-replace slot
+                    if recent is None:
+                        self.filled += 1
+                    else:
+                        self.overwrites += 1
+                    self._set(index + 1, deep)
+                self._set(index, entry)
+                self.stores += 1
+            else:
+                self._put(index + 1, entry)
+        else:
+            index = key % self.num_buckets
+            current_depth = self.depths[index]
+            if (self.replacement == "depth" and current_depth >= 0
+                and self.keys[index] != key and depth < current_depth):
+                return
+            self._put(index, entry)
+
+    def dump(self):
+        """Retrieves the filled slots of the table as arrays (see load()).
+
+        Returns:
+            {dict}: "slots" (uint32 slot indices), "keys" (uint64), "depths" (int16), "values"
+                    (float64), "flags" (uint8) and "moves" (int8, -1 for no move) of the entries.
+        """
+        depths = np.frombuffer(self.depths, dtype=np.int16)
+        slots = np.flatnonzero(depths >= 0)
+        return {
+            "slots": slots.astype(np.uint32),
+            "keys": np.frombuffer(self.keys, dtype=np.uint64)[slots],
+            "depths": depths[slots],
+            "values": np.frombuffer(self.values, dtype=np.float64)[slots],
+            "flags": np.frombuffer(self.flags, dtype=np.uint8)[slots],
+            "moves": np.frombuffer(self.moves, dtype=np.int8)[slots],
+        }
+
+    def load(self, entries, num_slots, replacement):
+        """Replaces the content of the table by entries dumped from a table (see dump()).
+
+        Entries dumped from a table with the same number of slots and replacement policy are
+        written back to their slots in bulk. Otherwise they are stored one by one, shallowest
+        first, so that the replacement policy keeps the deepest ones.
+
+        Args:
+            entries {dict}: arrays of the entries, as returned by dump().
+            num_slots {int}: number of slots of the table the entries were dumped from.
+            replacement {str}: replacement policy of the table the entries were dumped from.
+        """
+        self.clear()
+        if num_slots == self.num_slots and replacement == self.replacement:
+            slots = entries["slots"]
+            np.frombuffer(self.keys, dtype=np.uint64)[slots] = entries["keys"]
+            np.frombuffer(self.depths, dtype=np.int16)[slots] = entries["depths"]
+            np.frombuffer(self.values, dtype=np.float64)[slots] = entries["values"]
+            np.frombuffer(self.flags, dtype=np.uint8)[slots] = entries["flags"]
+            np.frombuffer(self.moves, dtype=np.int8)[slots] = entries["moves"]
+            self.filled = len(slots)
+        else:
+            order = np.argsort(entries["depths"], kind="stable")
+            columns = [entries[name][order].tolist() for name in ("keys", "depths", "values", "flags", "moves")]
+            for key, depth, value, flag, move in zip(*columns):
+                self.store(key, depth, value, flag, move if move >= 0 else None)
+        self.reset_stats()
+
+    def _put(self, index, entry):
+        """Writes entry in slot index, updating the store, overwrite and fill counters."""
+        if self.depths[index] < 0:
+            self.filled += 1
+        elif self.keys[index] != entry[0]:
+            self.overwrites += 1
+        self._set(index, entry)
+        self.stores += 1
+
+
+class EvaluationCache():
+    """ Least recently used cache of heuristic evaluations indexed by the hash of a position.
+
+    The cache only depends on the positions evaluated, so a single cache can be shared by
+    several players (eg both players of a Game) and kept across moves and games, as long as
+    every position stored comes from boards of the same size and k evaluated with the same
+    heuristic. Accesses are serialised by a lock, as the cache may also be used by the 
+    background search of a pondering player.
+    """
+    def __init__(self, capacity=2**18):
+        """ Initialises an empty cache.
+
+        Args:
+            capacity (int): maximum number of evaluations stored. Defaults to 2**18.
+
+        Raises:
+            ValueError if capacity is not positive.
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity must be positive, got {capacity}.")
+        self.capacity = capacity
+        self.entries = OrderedDict() #values keyed by position hash, least recently used first
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def reset_stats(self):
+        """Resets the hit, miss and eviction counters."""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """Returns the cache counters as a dictionary.
+
+        Returns:
+            {dict}: hits, misses, hit rate (None before the first lookup), evictions, number
+                    of entries and capacity.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "capacity": self.capacity,
+        }
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        with self._lock:
+            self.entries.clear()
+
+    def get(self, key):
+        """Looks up the evaluation of a position, marking it as the most recently used.
+
+        Args:
+            key {int}: hash of the position.
+
+        Returns:
+            {float}: evaluation stored for the position, or None if it is not stored.
+        """
+        with self._lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Stores the evaluation of a position, evicting the least recently used one if the
+        cache is full.
+
+        Args:
+            key {int}: hash of the position.
+            value {float}: evaluation of the position.
+        """
+        with self._lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def dump(self):
+        """Retrieves the entries of the cache as arrays (see load()).
+
+        Returns:
+            keys {np.ndarray}: uint64 hashes of the positions, least recently used first.
+            values {np.ndarray}: float64 evaluations of the positions.
+        """
+        with self._lock:
+            keys = np.fromiter(self.entries.keys(), dtype=np.uint64, count=len(self.entries))
+            values = np.fromiter(self.entries.values(), dtype=np.float64, count=len(self.entries))
+        return keys, values
+
+    def load(self, keys, values):
+        """Replaces the content of the cache by entries dumped from a cache (see dump()), keeping
+        the most recently used ones if they do not all fit.
+
+        Args:
+            keys {np.ndarray}: hashes of the positions, least recently used first.
+            values {np.ndarray}: evaluations of the positions.
+        """
+        start = max(len(keys) - self.capacity, 0)
+        entries = OrderedDict(zip(keys[start:].tolist(), values[start:].tolist()))
+        with self._lock:
+            self.entries = entries
+        self.reset_stats()